@@ -1,16 +1,33 @@
-from flask import Flask, render_template, Response, jsonify, send_file, request, session
+from time import time
+# Inicio del arranque, para el informe de tiempos de /ready
+STARTED_AT = time()
+from flask import Flask, render_template, Response, jsonify, send_file, request, session, stream_with_context, make_response
 import cv2
 import json
 import os
 import atexit
-import tempfile
-from datetime import datetime
-from time import time
+import threading
+import uuid
 from src.emotion_detector import EmotionDetector
-from src.api import gemini_reply
-from src.audio_recorder import AudioRecorder
+from src.api import gemini_reply, gemini_stream, response_cache, get_client, get_client_load_time
+from src.readiness import Readiness
+from src.conversation import Conversation
+from src.session_store import create_session_store
+from src.user_sessions import UserSessionRegistry, SessionLimitError
+from src.inference_worker import InferenceWorker
+from src.frame_hub import FrameHub
+from src.event_broadcast import sse_event
+from src.stream_encoder import StreamEncoder
+from src.batch_inference import BatchInferenceQueue, InferenceQueueFullError
+from src.frame_decoding import decode_frame, InvalidFrameError
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from flask_cors import CORS
-from faster_whisper import WhisperModel
+from src.transcription_service import TranscriptionService, TranscriptionBusyError, PROFILES
+from src.audio_decoding import InMemoryRequest, decode_upload, AudioTooLongError
+from src.streaming_transcription import StreamRegistry
+from src.audio_recorder import AudioRecorder
+from src.live_transcription import LiveTranscriber
+import numpy as np
 
 import json
 import re
@@ -18,9 +35,21 @@ import re
 
 app = Flask(__name__)
 app.secret_key = "natali"
+# Uploads en memoria y con tamaño acotado (Werkzeug responde 413 al excederlo)
+app.request_class = InMemoryRequest
+app.config["MAX_CONTENT_LENGTH"] = int(os.getenv("MAX_UPLOAD_MB", "10")) * 1024 * 1024
+MAX_AUDIO_SECONDS = float(os.getenv("MAX_AUDIO_SECONDS", "120"))
 CORS(app)
 
-model = WhisperModel("base", device="cpu", compute_type="int8")
+transcriber = TranscriptionService(
+    profile=os.getenv("WHISPER_PROFILE", "balanced"),
+    compute_type=os.getenv("WHISPER_COMPUTE_TYPE", "int8"),
+    max_queue=int(os.getenv("TRANSCRIPTION_MAX_QUEUE", "8")),
+    # Vacío para que Whisper detecte el idioma
+    language=os.getenv("WHISPER_LANGUAGE", "es") or None
+)
+# Transcripciones en streaming (PCM por bloques con resultados parciales)
+transcription_streams = StreamRegistry(transcriber)
 
 INITIAL_PROMPT = (
     "Eres un asistente musical amable y curioso llamado Kelsier. "
@@ -31,157 +60,237 @@ INITIAL_PROMPT = (
     "Cuando llegues a la quinta pregunta, da tus recomendaciones basadas en lo que conoces de la persona."
 )
 
+SUMMARY_PROMPT = (
+    "Resume en pocas frases lo que el usuario ha contado sobre sus gustos musicales y su estado de ánimo "
+    "en esta parte de la conversación, integrándolo con el resumen previo si existe. "
+    "Responde solo con el resumen."
+)
+
+# Estado de cada usuario en el servidor; la cookie de sesión solo guarda el id
+session_store = create_session_store()
+LLM_CONTEXT_TOKENS = int(os.getenv("LLM_CONTEXT_TOKENS", "800"))
+# Espera máxima por el turno anterior de la misma conversación
+LLM_LOCK_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "30")) * 2
+
+def get_session_id():
+    return session.setdefault("sid", uuid.uuid4().hex)
+
+# Locks por sesión (repartidos por hash) para que cargar -> modificar -> guardar la
+# conversación de un mismo usuario no se pise entre requests de este proceso
+_conversation_locks = [threading.Lock() for _ in range(64)]
+
+def conversation_lock(sid):
+    return _conversation_locks[hash(sid) % len(_conversation_locks)]
+
+def get_conversation(reset=False):
+    sid = get_session_id()
+    data = None if reset else session_store.get(sid)
+    if data and "conversation" in data:
+        return Conversation.from_dict(data["conversation"], token_budget=LLM_CONTEXT_TOKENS)
+    conversation = Conversation(token_budget=LLM_CONTEXT_TOKENS)
+    if reset:
+        save_conversation(sid, conversation)
+    return conversation
+
+def save_conversation(sid, conversation, **extra):
+    data = session_store.get(sid) or {}
+    data["conversation"] = conversation.to_dict()
+    data.update(extra)
+    session_store.set(sid, data)
+
+def summarize_turns(summary, turns):
+    """Compacta turnos viejos en el resumen acumulado de la conversación."""
+    turns_text = "\n".join(f"{turn['role'].upper()}: {turn['text']}" for turn in turns)
+    prompt = f"RESUMEN PREVIO: {summary or '(ninguno)'}\n\nCONVERSACIÓN:\n{turns_text}"
+    return gemini_reply(prompt, system_instruction=SUMMARY_PROMPT).strip()
+
 class WebEmotionDetector(EmotionDetector):
     
-    def __init__(self, webcam_index=0):
-        super().__init__(webcam_index)
+    def __init__(self, sessions, webcam_index=0, detector_backend='opencv', min_interval=0.5, max_interval=3.0):
+        super().__init__(webcam_index, detector_backend=detector_backend)
+        # Límites (segundos) del intervalo adaptativo entre frames enviados al hilo de inferencia.
+        # El hilo nunca acumula trabajo: si sigue ocupado, el frame nuevo reemplaza al pendiente.
+        self.scheduler.min_interval = min_interval
+        self.scheduler.max_interval = max_interval
+        # Cada usuario guarda sus detecciones en su propia sesión
+        self.sessions = sessions
+        # Última detección de la cámara del servidor, para dibujarla sobre el stream
         self.current_emotion_data = {
             'emotion': 'neutral',
             'confidence': 0.0,
             'all_emotions': {},
             'timestamp': time()
         }
-        self.is_capturing = True  # Estado de captura
-        self.temp_file = tempfile.NamedTemporaryFile(
-            mode='w+', 
-            suffix='.json', 
-            prefix='emotions_session_', 
-            delete=False,
-            encoding='utf-8'
+
+        # Inferencia fuera del camino de streaming
+        self.inference_worker = InferenceWorker(self.detect_emotion, self.publish_emotion)
+        self.inference_worker.start()
+
+        # Captura única de la cámara repartida a todos los clientes de /video_feed
+        self.frame_hub = FrameHub(self.produce_frame)
+        # Límite de FPS, escala y calidad JPEG del stream; se degradan si hay presión
+        self.encoder = StreamEncoder(
+            max_fps=float(os.getenv("STREAM_MAX_FPS", "15")),
+            quality=int(os.getenv("STREAM_JPEG_QUALITY", "80")),
+            min_quality=int(os.getenv("STREAM_MIN_QUALITY", "40")),
+            scale=float(os.getenv("STREAM_SCALE", "1.0")),
+            min_scale=float(os.getenv("STREAM_MIN_SCALE", "0.5"))
+        )
+        self._frames_dropped_seen = 0
+
+        # Frames subidos desde el navegador de cada usuario: se analizan por lotes
+        self.frame_queue = BatchInferenceQueue(
+            self.detect_emotions_batch,
+            max_batch=int(os.getenv("FRAME_BATCH_SIZE", "16")),
+            max_wait=float(os.getenv("FRAME_BATCH_WAIT", "0.02")),
+            max_queue=int(os.getenv("FRAME_QUEUE_SIZE", "64"))
         )
-        self.json_file_path = self.temp_file.name
-        self.initialize_json_file()
+        self.frame_queue.start()
         
         # Registrar función para limpiar al finalizar
-        atexit.register(self.cleanup_session)
-    
-    def initialize_json_file(self):
-        initial_data = {
-            'session_id': os.path.basename(self.json_file_path),
-            'session_start': datetime.now().isoformat(),
-            'emotions': []
-        }
-        # Cerrar el temp file y abrirlo para escritura
-        self.temp_file.close()
-        with open(self.json_file_path, 'w', encoding='utf-8') as f:
-            json.dump(initial_data, f, ensure_ascii=False, indent=2)
-    
-    def cleanup_session(self):
-        try:
-            if os.path.exists(self.json_file_path):
-                os.unlink(self.json_file_path)
-                print(f"Archivo de sesión eliminado: {self.json_file_path}")
-        except Exception as e:
-            print(f"Error al eliminar archivo de sesión: {e}")
+        atexit.register(self.cleanup)
+
+    @property
+    def is_capturing(self):
+        # Se analiza mientras al menos un usuario que ve la cámara no haya pausado
+        return bool(self.sessions.camera_sessions())
     
-    def restart_session(self):
-        try:
-            # Eliminar archivo anterior
-            if os.path.exists(self.json_file_path):
-                os.unlink(self.json_file_path)
-                print(f"Sesión anterior eliminada: {self.json_file_path}")
-            
-            # Crear nuevo archivo temporal
-            self.temp_file = tempfile.NamedTemporaryFile(
-                mode='w+', 
-                suffix='.json', 
-                prefix='emotions_session_', 
-                delete=False,
-                encoding='utf-8'
-            )
-            self.json_file_path = self.temp_file.name
-            self.initialize_json_file()
-            print(f"Nueva sesión iniciada: {self.json_file_path}")
-            
-        except Exception as e:
-            print(f"Error al reiniciar sesión: {e}")
+    def cleanup(self):
+        self.inference_worker.stop()
+        self.frame_queue.stop()
     
-    def save_emotion_to_json(self, emotion):
-        try:
-            with open(self.json_file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            emotion_entry = {
-                'emotion': emotion,
-            }
-            
-            data['emotions'].append(emotion_entry)
-            
-            if len(data['emotions']) > 200:
-                data['emotions'] = data['emotions'][-200:]
-            
-            with open(self.json_file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-                
-        except Exception as e:
-            print(f"Error al guardar en JSON: {e}")
+    def publish_emotion(self, emotion, confidence, all_emotions, timestamp):
+        """Callback del hilo de inferencia: publica el resultado en las sesiones que miran la cámara."""
+        self.scheduler.record_latency(self.inference_worker.last_inference_time)
+
+        self.current_emotion_data = {
+            'emotion': emotion,
+            'confidence': confidence,
+            'all_emotions': all_emotions,
+            'timestamp': timestamp
+        }
+        # Se serializa una vez para todas las sesiones y sus clientes de /emotion_stream
+        message = sse_event(self.current_emotion_data, 'emotion').encode('utf-8')
+        for user_session in self.sessions.camera_sessions():
+            user_session.publish_emotion(emotion, confidence, all_emotions, timestamp, message=message)
     
-    def generate_frames(self):
-        """Genera frames para streaming web, reutilizando la lógica existente."""
+    def produce_frame(self):
+        """Lee, analiza y codifica un frame. Lo llama solo el hilo de captura del FrameHub."""
+        current_time = time()
+        if not self.encoder.due(current_time):
+            # Por encima del límite de FPS: vaciar el buffer de la cámara sin decodificar
+            return b'' if self.cap.grab() else None
+
+        ret, frame = self.cap.read()
+        if not ret:
+            return None
+        
+        frame = cv2.flip(frame, 1)
+        
+        # Enviar el frame al hilo de inferencia sin esperar el resultado
+        if self.is_capturing and self.scheduler.should_analyze(frame, current_time):
+            self.inference_worker.submit(frame, current_time)
+
+        # Dibujar resultados solo si está capturando
+        if self.is_capturing:
+            data = self.current_emotion_data
+            self.draw_results(frame, data['emotion'], data['confidence'])
+        else:
+            # Mostrar texto de pausa
+            cv2.putText(frame, "CAPTURA PAUSADA", (50, 50), 
+                      cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+        
+        # Bajar la calidad si algún cliente descarta frames o la CPU está saturada
+        dropped = self.frame_hub.frames_dropped
+        self.encoder.adapt(lagging=dropped > self._frames_dropped_seen,
+                           busy=self.scheduler.cpu_pressure() > 1.0, now=current_time)
+        self._frames_dropped_seen = dropped
+
+        # Se codifica una sola vez y se comparte la misma parte MJPEG con todos los clientes
+        return self.encoder.encode(frame)
+
+    def generate_frames(self, user_session):
+        """Genera frames para streaming web a partir de la captura compartida."""
         if not self.cap or not self.cap.isOpened():
             print("No se puede acceder a la cámara")
             return
         
-        last_analysis_time = 0.0
-        emotion, confidence, all_emotions = 'neutral', 0.0, {}
-        
+        user_session.attach_viewer()
         try:
-            while True:
-                ret, frame = self.cap.read()
-                if not ret:
-                    break
-                
-                frame = cv2.flip(frame, 1)
-                current_time = time()
-                
-                if self.is_capturing and current_time - last_analysis_time > 3.0:
-                    emotion, confidence, all_emotions = self.detect_emotion(frame)
-                    
-                    # Actualizar datos
-                    self.current_emotion_data = {
-                        'emotion': emotion,
-                        'confidence': confidence,
-                        'all_emotions': all_emotions,
-                        'timestamp': current_time
-                    }
-                    
-                    # Guardar en json
-                    self.save_emotion_to_json(emotion)
-                    
-                    last_analysis_time = current_time
-                # Dibujar resultados solo si está capturando
-                if self.is_capturing:
-                    self.draw_results(frame, emotion, confidence)
-                else:
-                    # Mostrar texto de pausa
-                    cv2.putText(frame, "CAPTURA PAUSADA", (50, 50), 
-                              cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-                
-                ret, buffer = cv2.imencode('.jpg', frame)
-                if ret:
-                    yield (b'--frame\r\n'
-                           b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
-                           
+            for frame_bytes in self.frame_hub.stream():
+                if frame_bytes:
+                    yield frame_bytes
         except Exception as e:
             print(f"Error en generate_frames: {e}")
+        finally:
+            user_session.detach_viewer()
 
-# Instancia global del detector web
+# Instancia global del detector web (cámara y modelo compartidos)
 web_detector = None
-# Instancia global del audio recorder
-audio_recorder = None
+# Estado por usuario: log de emociones, captura y grabadora
+user_sessions = UserSessionRegistry(
+    max_sessions=int(os.getenv("MAX_USER_SESSIONS", "50")),
+    idle_timeout=float(os.getenv("USER_SESSION_IDLE", "1800")),
+    # Agregados de emociones visibles desde cualquier worker (p. ej. con SESSION_STORE=sqlite)
+    store=session_store
+)
+atexit.register(user_sessions.close_all)
 
-def get_web_detector():
+def create_web_detector():
     global web_detector
-    if web_detector is None:
-        web_detector = WebEmotionDetector(webcam_index=0)
+    web_detector = WebEmotionDetector(
+        user_sessions,
+        webcam_index=0,
+        detector_backend=os.getenv("EMOTION_DETECTOR_BACKEND", "opencv"),
+        min_interval=float(os.getenv("ANALYSIS_MIN_INTERVAL", "0.5")),
+        max_interval=float(os.getenv("ANALYSIS_MAX_INTERVAL", "3.0"))
+    )
+    # load_models() no lanza: sin modelos el subsistema queda en error (y se
+    # reintenta en el próximo uso) en vez de figurar como listo en /ready
+    if web_detector.emotion_model is None:
+        detector, web_detector = web_detector, None
+        detector.cleanup()
+        if detector.cap:
+            detector.cap.release()
+        raise RuntimeError(f"No se pudieron cargar los modelos de emociones: {detector.load_error}")
     return web_detector
 
-def get_audio_recorder():
-    global audio_recorder
-    if audio_recorder is None:
-        audio_recorder = AudioRecorder()
-    return audio_recorder
+# Subsistemas pesados: se cargan al primer uso o en el calentamiento de start_warmup()
+readiness = Readiness(started_at=STARTED_AT)
+emotion_subsystem = readiness.register("emotion_model", create_web_detector)
+# Los workers de transcripción y las llamadas a Gemini cargan por su cuenta;
+# el probe refleja esas cargas en /ready aunque no haya habido calentamiento
+readiness.register("whisper", transcriber.warmup,
+                   probe=lambda: transcriber.load_times.get(PROFILES[transcriber.profile]['model']))
+# Sin API key el servidor igual atiende emociones y transcripción
+readiness.register("gemini", get_client, required=False, probe=get_client_load_time)
+
+def get_web_detector():
+    return emotion_subsystem.get()
+
+def start_warmup():
+    if os.getenv("WARMUP_ON_START", "1") == "1":
+        readiness.warm_up()
 
+def get_user_session():
+    return user_sessions.get(get_session_id())
+
+def get_audio_recorder():
+    return get_user_session().recorder
+
+@app.before_request
+def assign_session_id():
+    # La cookie queda fijada con la página, antes de que el <img> de /video_feed y el
+    # EventSource de /emotion_stream hagan sus requests; las sondas no crean sesiones
+    if request.endpoint not in ('health', 'ready', 'static'):
+        get_session_id()
+
+@app.errorhandler(SessionLimitError)
+def session_limit_reached(e):
+    response = jsonify({'error': str(e)})
+    response.status_code = 503
+    response.headers['Retry-After'] = '60'
+    return response
 
 @app.route('/')
 def landing():
@@ -199,72 +308,168 @@ def index():
 def video_feed():
 
     detector = get_web_detector()
-    return Response(detector.generate_frames(),
+    user_session = get_user_session()
+    return Response(detector.generate_frames(user_session),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
 @app.route('/emotion_data')
 def emotion_data():
 
-    detector = get_web_detector()
-    return jsonify(detector.current_emotion_data)
+    user_session = get_user_session()
+    return jsonify(user_session.current_emotion_data)
 
 @app.route('/emotions_history')
 def emotions_history():
-    detector = get_web_detector()
+    user_session = get_user_session()
     try:
-        if os.path.exists(detector.json_file_path):
-            with open(detector.json_file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            return jsonify(data)
-        else:
-            return jsonify({'session_start': datetime.now().isoformat(), 'emotions': []})
+        # El historial se sirve desde memoria, sin tocar el disco
+        return jsonify(user_session.emotion_log.to_dict())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/emotions_summary')
+def emotions_summary():
+    user_session = get_user_session()
+    try:
+        return jsonify(user_session.emotion_summary())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/toggle_capture', methods=['POST'])
 def toggle_capture():
     """Endpoint para pausar/reanudar la captura de emociones."""
-    detector = get_web_detector()
+    user_session = get_user_session()
     data = request.get_json()
     
     if data and 'capturing' in data:
-        was_paused = not detector.is_capturing
-        detector.is_capturing = data['capturing']
+        was_paused = not user_session.is_capturing
+        user_session.is_capturing = data['capturing']
         
         # Si se está reanudando después de pausa, reiniciar sesión
-        if was_paused and detector.is_capturing:
-            detector.restart_session()
+        if was_paused and user_session.is_capturing:
+            user_session.restart()
         
-        return jsonify({
-            'success': True, 
-            'capturing': detector.is_capturing,
-            'session_restarted': was_paused and detector.is_capturing
-        })
+        state = {
+            'capturing': user_session.is_capturing,
+            'session_restarted': was_paused and user_session.is_capturing
+        }
+        user_session.events.publish(state, 'capture')
+        return jsonify({'success': True, **state})
     
     return jsonify({'success': False, 'error': 'Invalid request'}), 400
 
+@app.route('/emotion_stream')
+def emotion_stream():
+    """SSE con cada nueva detección ('emotion') y cada pausa/reanudación ('capture')."""
+    user_session = get_user_session()
+    # El estado actual primero, para no esperar a la próxima detección
+    initial = (sse_event(user_session.current_emotion_data, 'emotion')
+               + sse_event({'capturing': user_session.is_capturing}, 'capture'))
+    return Response(
+        stream_with_context(user_session.events.stream(initial.encode('utf-8'))),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.route('/get_emotions')
 def get_emotions():
-    detector = get_web_detector()
-    if detector.is_capturing and detector.current_emotion_data['all_emotions']:
-        return jsonify(detector.current_emotion_data['all_emotions'])
+    user_session = get_user_session()
+    if user_session.is_capturing and user_session.current_emotion_data['all_emotions']:
+        return jsonify(user_session.current_emotion_data['all_emotions'])
     else:
         return jsonify({})
 
+@app.route('/analyze_frame', methods=['POST'])
+def analyze_frame():
+    """Analiza un frame JPEG/WebP de la cámara del navegador del usuario.
+
+    Acepta el frame como cuerpo crudo (Content-Type: image/jpeg o image/webp)
+    o como campo 'frame' de un formulario multipart.
+    """
+    detector = get_web_detector()
+    user_session = get_user_session()
+    if not user_session.is_capturing:
+        return jsonify({'capturing': False})
+
+    upload = request.files.get('frame')
+    # El cuerpo crudo se decodifica sin copias; el multipart queda como alternativa
+    data = upload.read() if upload else request.get_data()
+    try:
+        timestamp = time()
+        frame = decode_frame(data, max_side=int(os.getenv("FRAME_MAX_SIDE", "640")))
+        faces = detector.frame_queue.analyze(frame, timeout=float(os.getenv("FRAME_TIMEOUT", "10")))
+    except InvalidFrameError as e:
+        return jsonify({'error': str(e)}), 400
+    except InferenceQueueFullError as e:
+        return busy_response(e)
+    except FutureTimeoutError:
+        return jsonify({'error': 'El análisis tardó demasiado'}), 504
+
+    if not faces:
+        return jsonify({'capturing': True, 'emotion': 'neutral', 'confidence': 0.0,
+                        'all_emotions': {}, 'faces': [], 'timestamp': timestamp})
+
+    # La cara más grande es la del usuario frente a su cámara
+    face = max(faces, key=lambda f: f['region']['w'] * f['region']['h'])
+    user_session.publish_emotion(face['emotion'], face['confidence'], face['all_emotions'], timestamp)
+    return jsonify({
+        'capturing': True,
+        'emotion': face['emotion'],
+        'confidence': face['confidence'],
+        'all_emotions': face['all_emotions'],
+        'faces': [f['region'] for f in faces],
+        'timestamp': timestamp
+    })
+
+@app.route('/ready')
+def ready():
+    """Estado de carga de cada subsistema; 503 hasta que los obligatorios estén listos."""
+    status = readiness.get_status()
+    return jsonify(status), 200 if status['ready'] else 503
+
 @app.route('/health')
 def health():
-    detector = get_web_detector()
-    camera_status = "OK" if (detector.cap and detector.cap.isOpened()) else "Error"
-    
-    # Verificar si existe el archivo JSON temporal
-    json_status = "OK" if os.path.exists(detector.json_file_path) else "No iniciado"
-    
+    # Sin get_web_detector(): el health check no espera (ni dispara) la carga de
+    # TensorFlow; las estadísticas del detector aparecen cuando ya está cargado
+    detector = emotion_subsystem.value
+    detector_state = {}
+    if detector is None:
+        camera_status = "No cargado"
+    else:
+        camera_status = "OK" if (detector.cap and detector.cap.isOpened()) else "Error"
+        detector_state = {
+            'inference': detector.inference_worker.get_stats(),
+            'model': detector.get_model_stats(),
+            'scheduler': detector.scheduler.get_stats(),
+            'cache': detector.cache.get_stats(),
+            'stream': detector.frame_hub.get_stats(),
+            'encoder': detector.encoder.get_stats(),
+            'frame_queue': detector.frame_queue.get_stats()
+        }
+
+    # Estado del usuario solo si ya tiene sesión: un health check no crea ninguna
+    user_state = {}
+    user_session = user_sessions.peek(session.get("sid"))
+    if user_session:
+        # Verificar si existe el journal temporal de la sesión
+        journal_path = user_session.emotion_log.journal_path
+        user_state = {
+            'json_logging': "OK" if journal_path and os.path.exists(journal_path) else "No iniciado",
+            'session_file': user_session.emotion_log.session_id,
+            'session_entries': len(user_session.emotion_log),
+            'capturing': user_session.is_capturing,
+            'emotion_stream': user_session.events.get_stats()
+        }
+
     return jsonify({
         'status': 'OK',
         'camera': camera_status,
-        'json_logging': json_status,
-        'session_file': os.path.basename(detector.json_file_path),
-        'capturing': detector.is_capturing,
+        **user_state,
+        'user_sessions': user_sessions.get_stats(),
+        **detector_state,
+        'transcription': transcriber.get_stats(),
+        'llm_cache': response_cache.get_stats(),
+        'sessions': session_store.get_stats(),
         'timestamp': time()
     })
 
@@ -307,7 +512,7 @@ def audio_status():
 
 @app.route("/transcribe")
 def transcribe():
-    session.pop("chat_history", None)
+    get_conversation(reset=True)
     return render_template("transcribe.html")
 
 
@@ -316,30 +521,154 @@ def transcribe():
 def transcribe_audio():
     try:
         audio_file = request.files["audio"]
-        filename = "temp.wav"
-        audio_file.save(filename)
+        # Decodificar directo a un buffer float32 de 16 kHz, sin archivos temporales
+        audio = decode_upload(audio_file.stream, max_duration=MAX_AUDIO_SECONDS)
 
-        segments, info = model.transcribe(filename, beam_size=5)
-        text = " ".join([seg.text for seg in segments])
-        os.remove(filename)
+        # Perfil opcional por request: fast, balanced o accurate
+        profile = request.form.get("profile") or request.args.get("profile")
+        text, info = transcriber.transcribe(audio, profile)
 
         #print(f"🎙️ Transcripción: {text}")
         return jsonify({"text": text})
+    except TranscriptionBusyError as e:
+        return busy_response(e)
+    except AudioTooLongError as e:
+        return jsonify({"error": str(e)}), 413
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"Error al transcribir: {e}")
         return jsonify({"error": str(e)})
     
 
+def busy_response(e):
+    response = jsonify({"error": str(e)})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(int(e.retry_after + 0.5))
+    return response
+
+@app.route("/transcribe_stream/start", methods=["POST"])
+def transcribe_stream_start():
+    """Abre un stream de transcripción; el cliente envía PCM int16 mono a 16 kHz por bloques."""
+    try:
+        profile = request.args.get("profile")
+        # Validar el perfil antes de abrir el stream
+        transcriber.resolve(profile)
+        stream_id = transcription_streams.create(profile=profile)
+        return jsonify({"stream_id": stream_id, "sample_rate": 16000})
+    except TranscriptionBusyError as e:
+        return busy_response(e)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/transcribe_stream/<stream_id>/chunk", methods=["POST"])
+def transcribe_stream_chunk(stream_id):
+    stream = transcription_streams.get(stream_id)
+    if stream is None:
+        return jsonify({"error": "Stream no encontrado"}), 404
+    try:
+        samples = np.frombuffer(request.get_data(), dtype="<i2").astype(np.float32) / 32768.0
+        stream.feed(samples)
+        return jsonify({"partials": stream.poll(), "text": stream.text})
+    except Exception as e:
+        print(f"Error en stream de transcripción: {e}")
+        return jsonify({"error": str(e)})
+
+@app.route("/transcribe_stream/<stream_id>/finish", methods=["POST"])
+def transcribe_stream_finish(stream_id):
+    stream = transcription_streams.close(stream_id)
+    if stream is None:
+        return jsonify({"error": "Stream no encontrado"}), 404
+    try:
+        partials = stream.finish()
+        return jsonify({"partials": partials, "text": stream.text})
+    except Exception as e:
+        print(f"Error al cerrar stream de transcripción: {e}")
+        return jsonify({"error": str(e)})
+
+# Transcripción en vivo del micrófono del servidor: desactivada por defecto. Con
+# CORS abierto, cualquier visitante u origen podría grabar el micrófono del host;
+# solo tiene sentido en un despliegue local (el CLI python -m src.live_transcription
+# cubre el uso desde la terminal). Hay un único grabador, del servidor, no uno por usuario.
+LIVE_MIC_ENABLED = os.getenv("LIVE_MIC_ENABLED", "0") == "1"
+live_recorder = None
+live_transcriber = None
+_live_lock = threading.Lock()
+
+def live_mic_disabled():
+    return jsonify({"error": "Transcripción del micrófono del servidor deshabilitada (LIVE_MIC_ENABLED=1 para activarla)"}), 404
+
+def cleanup_live_mic():
+    with _live_lock:
+        if live_transcriber:
+            live_transcriber.stop()
+        if live_recorder:
+            live_recorder.cleanup()
+
+atexit.register(cleanup_live_mic)
+
+@app.route("/audio/live/start", methods=["POST"])
+def live_transcription_start():
+    """Graba el micrófono del servidor y transcribe cada frase en cuanto hay una pausa."""
+    global live_recorder, live_transcriber
+    if not LIVE_MIC_ENABLED:
+        return live_mic_disabled()
+    try:
+        profile = request.args.get("profile")
+        transcriber.resolve(profile)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    with _live_lock:
+        if live_recorder is None:
+            live_recorder = AudioRecorder()
+        if not live_recorder.is_recording:
+            success, message = live_recorder.start_recording()
+            if not success:
+                return jsonify({"error": message}), 500
+        # Si ya está corriendo se comparte la misma transcripción
+        if live_transcriber is None or not live_transcriber.running:
+            live_transcriber = LiveTranscriber(live_recorder, transcriber, profile=profile)
+            live_transcriber.start()
+        return jsonify({"success": True, "status": live_recorder.get_recording_status()})
+
+@app.route("/audio/live")
+def live_transcription_poll():
+    """Frases transcritas desde la posición since (para pedir solo las nuevas)."""
+    if not LIVE_MIC_ENABLED:
+        return live_mic_disabled()
+    live = live_transcriber
+    if live is None:
+        return jsonify({"error": "No hay transcripción en vivo"}), 404
+    since = request.args.get("since", 0, type=int)
+    texts = live.texts
+    return jsonify({"texts": texts[since:], "next": len(texts), "stats": live.get_stats()})
+
+@app.route("/audio/live/stop", methods=["POST"])
+def live_transcription_stop():
+    global live_transcriber
+    if not LIVE_MIC_ENABLED:
+        return live_mic_disabled()
+    with _live_lock:
+        live = live_transcriber
+        if live is None:
+            return jsonify({"error": "No hay transcripción en vivo"}), 404
+        live_recorder.stop_recording()
+        texts = live.stop()
+        live_transcriber = None
+    return jsonify({"text": " ".join(texts), "stats": live.get_stats()})
+
 @app.route("/start_chat", methods=["GET"])
 def start_chat():
     """Inicia la conversación: la IA saluda y hace la primera pregunta."""
-    session["chat_history"] = []
-    session["question_count"] = 1
-
+    sid = get_session_id()
     primera_respuesta = "¡Hola! Soy Kelsier. Quiero conocerte un poco para recomendarte música que te encante. " \
                         "Cuéntame, ¿qué tipo de música sueles escuchar últimamente?"
 
-    session["chat_history"].append({"role": "assistant", "text": primera_respuesta})
+    with conversation_lock(sid):
+        conversation = get_conversation(reset=True)
+        conversation.add("assistant", primera_respuesta)
+        save_conversation(sid, conversation)
     return jsonify({"response": primera_respuesta})
 
 """
@@ -378,42 +707,26 @@ def call_llm():
         return jsonify({"error": str(e)})
 """
 
-def generar_recomendaciones(chat_history):
+def generar_recomendaciones(conversation):
     """Analiza las respuestas y da recomendaciones finales, integrando emociones detectadas."""
-    context_text = "\n".join(
-        [f"{msg['role'].upper()}: {msg['text']}" for msg in chat_history]
-    )
+    context_text = conversation.context_text()
 
-    # --- 1️⃣ Cargar datos de emociones desde el detector ---
-    detector = get_web_detector()
+    # --- 1️⃣ Cargar datos de emociones de la sesión del usuario ---
+    user_session = get_user_session()
     emociones_porcentaje = {}
 
     try:
-        if os.path.exists(detector.json_file_path):
-            with open(detector.json_file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                emociones = [e["emotion"] for e in data.get("emotions", [])]
-
-            if emociones:
-                total = len(emociones)
-                conteo = {}
-                for emo in emociones:
-                    conteo[emo] = conteo.get(emo, 0) + 1
-
-                # Calcular porcentaje por emoción
-                emociones_porcentaje = {
-                    emo: round((count / total) * 100, 1)
-                    for emo, count in conteo.items()
-                }
-            else:
-                emociones_porcentaje = {"neutral": 100.0}
-        else:
-            emociones_porcentaje = {"neutral": 100.0}
+        # Agregados mantenidos incrementalmente por el log: O(1) sin importar la sesión
+        resumen = user_session.emotion_summary()
+        emociones_porcentaje = resumen['percentages']
+        estado_reciente = resumen['recent_mood']
     except Exception as e:
         print(f"⚠️ Error leyendo emociones: {e}")
         emociones_porcentaje = {"neutral": 100.0}
+        estado_reciente = {"neutral": 100.0}
 
     print(f"📊 Emociones detectadas durante la sesión: {emociones_porcentaje}")
+    emociones = {"percentages": emociones_porcentaje, "recent_mood": estado_reciente}
 
     # --- 2️⃣ Construir prompt para la IA ---
     prompt = (
@@ -428,7 +741,8 @@ def generar_recomendaciones(chat_history):
         "}\n\n"
         "No incluyas texto adicional fuera del JSON.\n"
         "Asegúrate de que los enlaces sean de perfil de artista, no de canciones.\n\n"
-        f"📈 EMOCIONES DETECTADAS (porcentaje aproximado): {json.dumps(emociones_porcentaje, ensure_ascii=False)}\n\n"
+        f"📈 EMOCIONES DETECTADAS (porcentaje aproximado): {json.dumps(emociones_porcentaje, ensure_ascii=False)}\n"
+        f"🕒 ESTADO DE ÁNIMO RECIENTE (porcentaje aproximado): {json.dumps(estado_reciente, ensure_ascii=False)}\n\n"
         f"🗣️ CONVERSACIÓN:\n{context_text}"
     )
 
@@ -452,38 +766,66 @@ def generar_recomendaciones(chat_history):
         data = json.loads(cleaned)
         if "recomendaciones" in data:
             print("✅ JSON parseado correctamente.")
-            return {"parsed": True, "data": data}
+            return {"parsed": True, "data": data, "emotions": emociones}
         else:
             raise ValueError("No contiene 'recomendaciones'")
     except Exception as e:
         print(f"⚠️ No se pudo parsear el JSON: {e}")
-        return {"parsed": False, "data": raw_response}
+        return {"parsed": False, "data": raw_response, "emotions": emociones}
+
+def stream_llm_reply(prompt, sid, conversation):
+    """Reenvía los fragmentos de Gemini como eventos SSE y guarda la respuesta completa."""
+    partes = []
+    try:
+        for fragmento in gemini_stream(prompt, system_instruction=INITIAL_PROMPT):
+            partes.append(fragmento)
+            yield sse_event({"delta": fragmento})
+
+        respuesta = "".join(partes)
+        conversation.add("assistant", respuesta)
+        save_conversation(sid, conversation)
+        yield sse_event({"response": respuesta, "done": False}, event="end")
+    except Exception as e:
+        print(f"⚠️ Error en LLM (streaming): {e}")
+        yield sse_event({"error": str(e)}, event="end")
 
 @app.route("/llm", methods=["POST"])
 def call_llm():
+    sid = get_session_id()
+    lock = conversation_lock(sid)
+    if not lock.acquire(timeout=LLM_LOCK_TIMEOUT):
+        return jsonify({"error": "Ya hay una respuesta en curso para esta conversación"}), 409
+    try:
+        response = make_response(llm_turn(sid))
+    except BaseException:
+        lock.release()
+        raise
+    # El lock se suelta al cerrar la respuesta: en streaming, cuando termina el SSE
+    # y ya se guardó la respuesta completa
+    response.call_on_close(lock.release)
+    return response
+
+def llm_turn(sid):
+    """Un turno de la conversación; se llama con el lock de la sesión tomado."""
     try:
         data = request.get_json()
         user_message = data.get("text", "").strip()
 
-        chat_history = session.get("chat_history", [])
-        question_count = session.get("question_count", 1)
+        conversation = get_conversation()
+        question_count = conversation.question_count
 
         # Lo ultimo que dijo el user
-        if not chat_history or chat_history[-1]["role"] != "user":
-            chat_history.append({"role": "user", "text": user_message})
+        if conversation.last_role != "user":
+            conversation.add("user", user_message)
 
-        """
-        if question_count >= 5:
-            respuesta = generar_recomendaciones(chat_history)
-            session["chat_history"].append({"role": "assistant", "text": respuesta})
-            session.modified = True
-            return jsonify({"response": respuesta, "done": True})"""
-        
         if question_count >= 5:
-            recomendacion = generar_recomendaciones(chat_history)
-            chat_history.append({"role": "assistant", "text": recomendacion})
-            session["chat_history"] = chat_history
-            session.modified = True
+            recomendacion = generar_recomendaciones(conversation)
+            texto = recomendacion["data"]
+            if not isinstance(texto, str):
+                texto = json.dumps(texto, ensure_ascii=False)
+            conversation.add("assistant", texto)
+            # Junto al chat queda el resumen emocional usado para recomendar
+            save_conversation(sid, conversation, emotions=recomendacion["emotions"])
 
             return jsonify({
                 "response": recomendacion["data"],
@@ -491,22 +833,30 @@ def call_llm():
                 "done": True
             })
 
-        # contexto
-        context_text = "\n".join(
-            [f"{msg['role'].upper()}: {msg['text']}" for msg in chat_history]
-        )
+        # Solo los turnos recientes van textuales; los viejos quedan en el resumen
+        conversation.compact(summarize_turns)
+        context_text = conversation.context_text()
+        # Solo se guarda tras una respuesta correcta: si Gemini falla, el turno del
+        # usuario y el número de pregunta quedan como estaban y el reintento los repite
+        conversation.question_count = question_count + 1
 
-        # Instrucción dinámica para el modelo
+        # El prompt de sistema (INITIAL_PROMPT) va aparte, en system_instruction
         prompt = (
-            f"{INITIAL_PROMPT}\n\nCONVERSACIÓN HASTA AHORA:\n{context_text}\n\n"
+            f"CONVERSACIÓN HASTA AHORA:\n{context_text}\n\n"
             f"Ahora haz la siguiente pregunta corta número {question_count + 1} según lo que te haya dicho."
         )
 
-        respuesta = gemini_reply(prompt)
+        if "text/event-stream" in request.headers.get("Accept", ""):
+            return Response(
+                stream_with_context(stream_llm_reply(prompt, sid, conversation)),
+                mimetype="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
 
-        chat_history.append({"role": "assistant", "text": respuesta})
-        session["chat_history"] = chat_history
-        session["question_count"] = question_count + 1
+        respuesta = gemini_reply(prompt, system_instruction=INITIAL_PROMPT)
+
+        conversation.add("assistant", respuesta)
+        save_conversation(sid, conversation)
 
         #print(f"🤖 Pregunta {question_count + 1}: {respuesta}")
         return jsonify({"response": respuesta, "done": False})
@@ -526,7 +876,14 @@ def gemini_call(text):
     return respuesta
 """
     
+if __name__ != '__main__':
+    # Bajo un servidor WSGI (gunicorn...) cada worker calienta al importar la app
+    start_warmup()
+
 if __name__ == '__main__':
+    # Con el reloader de debug, solo el proceso hijo (el que atiende) carga los modelos
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_warmup()
     try:
         print("Iniciando servidor en: http://localhost:8080")
         app.run(debug=True, host='0.0.0.0', port=8080, threaded=True)
@@ -537,8 +894,7 @@ if __name__ == '__main__':
         if web_detector and web_detector.cap:
             web_detector.cap.release()
         if web_detector:
-            web_detector.cleanup_session()
-        if audio_recorder:
-            audio_recorder.cleanup()
+            web_detector.cleanup()
+        user_sessions.close_all()
         cv2.destroyAllWindows()
         print("Recursos liberados y archivos temporales eliminados")
\ No newline at end of file
@@ -0,0 +1,96 @@
+import os
+from typing import Optional
+import cv2
+import numpy as np
+
+
+class AnalysisScheduler:
+    """Decide cuándo analizar un frame en lugar de usar un intervalo fijo.
+
+    El intervalo base sale de la latencia medida de la inferencia (para que el
+    análisis use como mucho target_load de una CPU) y se alarga si la máquina ya
+    está cargada. Además compara una miniatura en escala de grises con la del
+    último frame analizado: si la escena no cambió se espera hasta max_interval,
+    y si cambió se analiza en cuanto lo permita el intervalo base.
+    """
+
+    def __init__(self, min_interval: float = 0.5, max_interval: float = 3.0,
+                 target_load: float = 0.5, change_threshold: float = 6.0,
+                 thumb_size=(32, 24)):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_load = target_load
+        # Diferencia media absoluta (0-255) a partir de la cual se considera que la escena cambió
+        self.change_threshold = change_threshold
+        self.thumb_size = thumb_size
+
+        self.latency = 0.0
+        self.last_analysis_time = 0.0
+        self.last_diff = 0.0
+        self._last_thumb: Optional[np.ndarray] = None
+
+        self.scheduled = 0
+        self.skipped_unchanged = 0
+
+    def record_latency(self, seconds: float) -> None:
+        # Media móvil exponencial para no reaccionar a un solo análisis lento
+        self.latency = seconds if not self.latency else 0.7 * self.latency + 0.3 * seconds
+
+    def cpu_pressure(self) -> float:
+        """Factor >= 1 que crece cuando la carga del sistema supera los núcleos disponibles."""
+        if not hasattr(os, 'getloadavg'):
+            return 1.0
+        try:
+            load = os.getloadavg()[0] / (os.cpu_count() or 1)
+        except OSError:
+            return 1.0
+        return max(1.0, load)
+
+    def current_interval(self) -> float:
+        interval = (self.latency / self.target_load) * self.cpu_pressure()
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def _thumbnail(self, frame) -> np.ndarray:
+        small = cv2.resize(frame, self.thumb_size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def should_analyze(self, frame, now: float) -> bool:
+        elapsed = now - self.last_analysis_time
+        if elapsed < self.min_interval:
+            return False
+
+        thumb = self._thumbnail(frame)
+        if self._last_thumb is None:
+            changed = True
+        else:
+            self.last_diff = float(cv2.absdiff(thumb, self._last_thumb).mean())
+            changed = self.last_diff >= self.change_threshold
+
+        if changed:
+            due = elapsed >= self.current_interval()
+        else:
+            # Escena quieta: solo un análisis de refresco cada max_interval
+            due = elapsed >= self.max_interval
+            if not due and elapsed >= self.current_interval():
+                self.skipped_unchanged += 1
+
+        if due:
+            self._last_thumb = thumb
+            self.last_analysis_time = now
+            self.scheduled += 1
+        return due
+
+    def reset(self) -> None:
+        self.last_analysis_time = 0.0
+        self._last_thumb = None
+
+    def get_stats(self) -> dict:
+        return {
+            'interval': round(self.current_interval(), 3),
+            'min_interval': self.min_interval,
+            'max_interval': self.max_interval,
+            'latency': round(self.latency, 4),
+            'last_diff': round(self.last_diff, 2),
+            'scheduled': self.scheduled,
+            'skipped_unchanged': self.skipped_unchanged
+        }
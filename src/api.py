@@ -1,22 +1,115 @@
+import asyncio
+import concurrent.futures
 import os
+import queue
+import random
+import threading
+import time
 from pathlib import Path
+from typing import Optional
+
+import httpx
 from dotenv import load_dotenv
-from google import genai
+
+from src.llm_cache import LLMCache
 
 ENV_PATH = Path(__file__).resolve().parent.parent / ".env"
 load_dotenv(ENV_PATH)
 
 API_KEY = os.getenv("GOOGLE_API_KEY")
-if not API_KEY:
-    raise RuntimeError(f"No encontré GOOGLE_API_KEY en {ENV_PATH}")
 
-client = genai.Client(api_key=API_KEY)
+MODEL = "gemini-2.5-flash"   # o "gemini-1.5-flash" si no tienes 2.5
+
+# Plazo total por llamada (incluye reintentos), concurrencia máxima y reintentos
+DEFAULT_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "30"))
+MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+
+# Códigos HTTP que vale la pena reintentar
+TRANSIENT_CODES = {408, 429, 500, 502, 503, 504}
+
+# Un solo cliente (y su pool de conexiones) para todo el proceso, creado al primer uso:
+# el servidor arranca aunque falte la API key y el SDK no se importa hasta hacer falta
+_client = None
+_client_lock = threading.Lock()
+# Segundos que tomó crear el cliente (None mientras no exista)
+client_load_time: Optional[float] = None
+
+
+def get_client():
+    global _client, client_load_time
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if not API_KEY:
+                    raise RuntimeError(f"No encontré GOOGLE_API_KEY en {ENV_PATH}")
+                start = time.monotonic()
+                from google import genai
+                _client = genai.Client(api_key=API_KEY)
+                client_load_time = time.monotonic() - start
+    return _client
+
+
+def get_client_load_time() -> Optional[float]:
+    return client_load_time
+
+# Respuestas ya generadas para prompts idénticos (LLM_CACHE_DB para persistir en SQLite)
+response_cache = LLMCache(
+    capacity=int(os.getenv("LLM_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("LLM_CACHE_TTL", "3600")),
+    db_path=os.getenv("LLM_CACHE_DB") or None
+)
+
+
+class _LLMLoop:
+    """Event loop en un hilo propio donde corren todas las llamadas async a Gemini.
+
+    Los hilos de Flask solo esperan un future; el semáforo limita cuántas
+    llamadas hay en vuelo al mismo tiempo.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="gemini-loop", daemon=True)
+        self.thread.start()
+        self.semaphore = asyncio.run_coroutine_threadsafe(
+            self._make_semaphore(max_concurrency), self.loop
+        ).result()
+
+    @staticmethod
+    async def _make_semaphore(max_concurrency: int) -> asyncio.Semaphore:
+        return asyncio.Semaphore(max_concurrency)
+
+    def run(self, coro, timeout: Optional[float] = None):
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            # Que la llamada no siga corriendo (o esperando el semáforo) sin nadie que la espere
+            future.cancel()
+            raise
+
+
+_llm_loop = _LLMLoop(MAX_CONCURRENCY)
+
+
+def _is_transient(error: Exception) -> bool:
+    from google.genai import errors
+    if isinstance(error, errors.APIError):
+        return error.code in TRANSIENT_CODES
+    return isinstance(error, (httpx.TransportError, asyncio.TimeoutError))
+
+
+# Respuesta de relleno cuando Gemini no devuelve texto (bloqueo, respuesta vacía...)
+NO_TEXT_REPLY = "[Gemini] No hubo texto en la respuesta."
 
-def gemini_reply(text: str) -> str:
-    resp = client.models.generate_content(
-        model="gemini-2.5-flash",   # o "gemini-1.5-flash" si no tienes 2.5
-        contents=text
-    )
+
+def _cacheable(respuesta: str) -> bool:
+    # Una respuesta vacía o bloqueada no debe repetirse durante todo el TTL
+    return bool(respuesta.strip()) and respuesta != NO_TEXT_REPLY
+
+
+def _extract_text(resp) -> str:
     # La forma simple:
     if resp.text:
         return resp.text
@@ -31,4 +124,152 @@ def gemini_reply(text: str) -> str:
         if parts:
             return "\n".join(parts)
 
-    return "[Gemini] No hubo texto en la respuesta."
+    return NO_TEXT_REPLY
+
+
+def _config(system_instruction: Optional[str]):
+    # El prompt de sistema va en su propio campo en lugar de repetirse en el contenido
+    if not system_instruction:
+        return None
+    from google.genai import types
+    return types.GenerateContentConfig(system_instruction=system_instruction)
+
+
+def _cache_key(text: str, system_instruction: Optional[str]) -> str:
+    return f"{system_instruction}\n---\n{text}" if system_instruction else text
+
+
+async def gemini_reply_async(text: str, timeout: Optional[float] = None,
+                             system_instruction: Optional[str] = None) -> str:
+    """Llamada async con plazo total, concurrencia acotada y reintentos con backoff y jitter."""
+    timeout = timeout or DEFAULT_TIMEOUT
+    deadline = asyncio.get_running_loop().time() + timeout
+
+    async with _llm_loop.semaphore:
+        for attempt in range(MAX_RETRIES + 1):
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                raise TimeoutError(f"Gemini no respondió en {timeout:.0f}s")
+            try:
+                resp = await asyncio.wait_for(
+                    get_client().aio.models.generate_content(
+                        model=MODEL, contents=text, config=_config(system_instruction)
+                    ),
+                    remaining
+                )
+                return _extract_text(resp)
+            except Exception as e:
+                if attempt == MAX_RETRIES or not _is_transient(e):
+                    raise
+                # Backoff exponencial con jitter completo
+                delay = random.uniform(0, min(8.0, 0.5 * 2 ** attempt))
+                if asyncio.get_running_loop().time() + delay >= deadline:
+                    raise
+                print(f"⚠️ Error transitorio de Gemini ({e}); reintento {attempt + 1} en {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+
+def gemini_reply(text: str, timeout: Optional[float] = None, use_cache: bool = True,
+                 system_instruction: Optional[str] = None) -> str:
+    """Fachada síncrona y thread-safe para los endpoints de Flask."""
+    cache_key = _cache_key(text, system_instruction)
+    if use_cache:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    timeout = timeout or DEFAULT_TIMEOUT
+    # Margen sobre el plazo interno para recibir la excepción de timeout propia
+    respuesta = _llm_loop.run(gemini_reply_async(text, timeout, system_instruction), timeout + 1)
+    if use_cache and _cacheable(respuesta):
+        response_cache.put(cache_key, respuesta)
+    return respuesta
+
+
+async def gemini_stream_async(text: str, timeout: Optional[float] = None,
+                              system_instruction: Optional[str] = None):
+    """Generador async de fragmentos de texto a medida que Gemini los produce.
+
+    Solo se reintenta si el error ocurre antes del primer fragmento; después ya
+    se entregó texto al cliente y reintentar lo duplicaría.
+    """
+    timeout = timeout or DEFAULT_TIMEOUT
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+
+    async with _llm_loop.semaphore:
+        for attempt in range(MAX_RETRIES + 1):
+            started = False
+            try:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise TimeoutError(f"Gemini no respondió en {timeout:.0f}s")
+                stream = await asyncio.wait_for(
+                    get_client().aio.models.generate_content_stream(
+                        model=MODEL, contents=text, config=_config(system_instruction)
+                    ),
+                    remaining
+                )
+                iterator = stream.__aiter__()
+                while True:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        raise TimeoutError(f"Gemini no terminó en {timeout:.0f}s")
+                    try:
+                        chunk = await asyncio.wait_for(iterator.__anext__(), remaining)
+                    except StopAsyncIteration:
+                        return
+                    if chunk.text:
+                        started = True
+                        yield chunk.text
+            except Exception as e:
+                if started or attempt == MAX_RETRIES or not _is_transient(e):
+                    raise
+                delay = random.uniform(0, min(8.0, 0.5 * 2 ** attempt))
+                if loop.time() + delay >= deadline:
+                    raise
+                print(f"⚠️ Error transitorio de Gemini ({e}); reintento {attempt + 1} en {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+
+def gemini_stream(text: str, timeout: Optional[float] = None, use_cache: bool = True,
+                  system_instruction: Optional[str] = None):
+    """Fachada síncrona de gemini_stream_async: generador de fragmentos para Flask."""
+    cache_key = _cache_key(text, system_instruction)
+    if use_cache:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+    timeout = timeout or DEFAULT_TIMEOUT
+    pieces: queue.Queue = queue.Queue()
+
+    async def pump():
+        try:
+            async for piece in gemini_stream_async(text, timeout, system_instruction):
+                pieces.put(("delta", piece))
+        except Exception as e:
+            pieces.put(("error", e))
+        finally:
+            pieces.put(("end", None))
+
+    future = asyncio.run_coroutine_threadsafe(pump(), _llm_loop.loop)
+    parts = []
+    try:
+        while True:
+            # Margen sobre el plazo interno, que ya corta la llamada
+            kind, value = pieces.get(timeout=timeout + 1)
+            if kind == "delta":
+                parts.append(value)
+                yield value
+            elif kind == "error":
+                raise value
+            else:
+                if use_cache and _cacheable("".join(parts)):
+                    response_cache.put(cache_key, "".join(parts))
+                return
+    finally:
+        # Si el cliente se desconectó a mitad, cancelar la llamada en curso
+        if not future.done():
+            future.cancel()
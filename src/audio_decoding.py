@@ -0,0 +1,57 @@
+from io import BytesIO
+
+import numpy as np
+from flask import Request
+
+# Whisper trabaja con audio mono a 16 kHz
+SAMPLE_RATE = 16000
+
+
+class AudioTooLongError(ValueError):
+    """El audio subido supera la duración máxima permitida."""
+
+
+class InMemoryRequest(Request):
+    """Request de Flask que guarda los archivos subidos en memoria.
+
+    Por defecto Werkzeug vuelca a un archivo temporal los uploads de más de
+    500 KB; aquí siempre se usa un BytesIO. El tamaño queda acotado por
+    MAX_CONTENT_LENGTH, que Werkzeug aplica mientras lee el stream.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return BytesIO()
+
+
+def decode_upload(stream, max_duration: float = 120.0) -> np.ndarray:
+    """Decodifica un audio subido (wav, webm, ogg...) a float32 mono de 16 kHz sin tocar el disco.
+
+    Se decodifica frame a frame con PyAV (como hace decode_audio de faster_whisper)
+    y se corta en cuanto se supera max_duration: un archivo muy comprimido no
+    llega a expandirse entero en memoria.
+    """
+    import av
+    stream.seek(0)
+    max_samples = int(max_duration * SAMPLE_RATE)
+    resampler = av.audio.resampler.AudioResampler(format="s16", layout="mono", rate=SAMPLE_RATE)
+    chunks = []
+    total = 0
+
+    def add(frames) -> None:
+        nonlocal total
+        for frame in frames:
+            chunk = frame.to_ndarray().reshape(-1)
+            total += len(chunk)
+            if total > max_samples:
+                raise AudioTooLongError(f"El audio supera el máximo de {max_duration:.0f}s")
+            chunks.append(chunk)
+
+    with av.open(stream, mode="r", metadata_errors="ignore") as container:
+        for frame in container.decode(audio=0):
+            add(resampler.resample(frame))
+        # Vaciar las muestras que el resampler aún retiene
+        add(resampler.resample(None))
+
+    if not chunks:
+        return np.zeros(0, dtype=np.float32)
+    return np.concatenate(chunks).astype(np.float32) / 32768.0
@@ -1,28 +1,53 @@
 import sounddevice as sd
 import numpy as np
 import threading
+import queue
 import tempfile
 import os
-from datetime import datetime
 import wave
 
 
 class AudioRecorder:
-    def __init__(self, sample_rate=44100, channels=1):
+    def __init__(self, sample_rate=44100, channels=1, max_buffer_seconds=10):
 
         self.sample_rate = sample_rate
         self.channels = channels
+        # Bloques de 100 ms; como mucho max_buffer_seconds pendientes de escribir
+        self.blocksize = sample_rate // 10
+        self.max_blocks = max(1, int(max_buffer_seconds * 10))
         self.is_recording = False
-        self.audio_data = []
-        self.recording_thread = None
+        self.stream = None
         self.temp_file_path = None
         
+        # El callback de audio solo encola bloques; un hilo los convierte y escribe al WAV.
+        # La cola es acotada: si el disco no da abasto se descartan bloques (y se cuentan)
+        # en lugar de crecer en memoria o bloquear el hilo de audio
+        self._blocks = None
+        self.writer_thread = None
+        self.frames_captured = 0
+        self.frames_written = 0
+        self.frames_dropped = 0
+        # Consumidores en vivo de los bloques (p. ej. LiveTranscriber). Tupla que se
+        # reemplaza entera para que el callback la recorra sin locks
+        self.listeners = ()
+        
+    def add_listener(self, listener):
+        """listener(indata) se llama desde el hilo de audio con cada bloque float32.
+
+        PortAudio reutiliza indata: el listener debe copiar lo que quiera guardar
+        y volver enseguida.
+        """
+        self.listeners = self.listeners + (listener,)
+    
+    def remove_listener(self, listener):
+        self.listeners = tuple(l for l in self.listeners if l is not listener)
+        
     def start_recording(self):
         if self.is_recording:
             return False, "Ya se está grabando"
-            
-        self.is_recording = True
-        self.audio_data = []
+        # Si la grabación anterior sigue escribiéndose, esperar a que cierre su archivo
+        if self.writer_thread:
+            self.writer_thread.join()
         
         # Crear archivo temporal
         temp_file = tempfile.NamedTemporaryFile(
@@ -33,10 +58,31 @@ class AudioRecorder:
         self.temp_file_path = temp_file.name
         temp_file.close()
         
+        self.frames_captured = 0
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self._blocks = queue.Queue(maxsize=self.max_blocks)
+        self.writer_thread = threading.Thread(
+            target=self._write_audio, args=(self._blocks, self.temp_file_path), daemon=True
+        )
+        self.writer_thread.start()
 
-        self.recording_thread = threading.Thread(target=self._record_audio)
-        self.recording_thread.start()
+        try:
+            self.stream = sd.InputStream(
+                callback=self._callback,
+                channels=self.channels,
+                samplerate=self.sample_rate,
+                blocksize=self.blocksize,
+                dtype=np.float32
+            )
+            self.stream.start()
+        except Exception as e:
+            print(f"Error durante la grabación: {e}")
+            self.stream = None
+            self._finish_writer()
+            return False, f"No se pudo iniciar la grabación: {e}"
         
+        self.is_recording = True
         return True, "Grabación iniciada"
     
     def stop_recording(self):
@@ -45,65 +91,84 @@ class AudioRecorder:
             
         self.is_recording = False
         
-        # Esperar a que termine el hilo de grabación
-        if self.recording_thread:
-            self.recording_thread.join()
+        # abort() descarta lo que queda en el buffer del dispositivo y vuelve enseguida
+        if self.stream:
+            self.stream.abort()
+            self.stream.close()
+            self.stream = None
+        # El hilo escritor termina de volcar lo pendiente y cierra el WAV por su cuenta;
+        # hasta entonces get_recording_status() informa 'saving'
+        self._finish_writer()
             
-        # Guardar audio en archivo
-        if self.audio_data:
-            self._save_audio_file()
-            return True, f"Grabación guardada en {self.temp_file_path}"
+        if self.frames_captured:
+            return True, f"Guardando grabación en {self.temp_file_path}"
         else:
             return False, "No hay datos de audio para guardar"
     
-    def _record_audio(self):
+    def _finish_writer(self):
+        # El marcador de fin no se descarta: se espera a que el escritor libere lugar
+        while self.writer_thread.is_alive():
+            try:
+                self._blocks.put(None, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+    
+    def _callback(self, indata, frames, time, status):
+        if status:
+            print(f"Audio recording status: {status}")
+        if self.is_recording:
+            # PortAudio reutiliza indata: se encola una copia
+            try:
+                self._blocks.put_nowait(indata.copy())
+            except queue.Full:
+                self.frames_dropped += frames
+            self.frames_captured += frames
+            for listener in self.listeners:
+                listener(indata)
+    
+    def _write_audio(self, blocks, path):
         try:
-            def callback(indata, frames, time, status):
-                if status:
-                    print(f"Audio recording status: {status}")
-                if self.is_recording:
-                    self.audio_data.append(indata.copy())
-            
-            with sd.InputStream(
-                callback=callback,
-                channels=self.channels,
-                samplerate=self.sample_rate,
-                dtype=np.float32
-            ):
-                while self.is_recording:
-                    sd.sleep(100)  # Dormir 100ms
-                    
+            with wave.open(path, 'wb') as wav_file:
+                wav_file.setnchannels(self.channels)
+                wav_file.setsampwidth(2)  # 2 bytes para int16
+                wav_file.setframerate(self.sample_rate)
+                while True:
+                    block = blocks.get()
+                    if block is None:
+                        break
+                    # Convertir a int16 para compatibilidad WAV, reutilizando el bloque
+                    np.clip(block, -1.0, 1.0, out=block)
+                    block *= 32767
+                    wav_file.writeframes(block.astype(np.int16).tobytes())
+                    self.frames_written += len(block)
         except Exception as e:
-            print(f"Error durante la grabación: {e}")
-            self.is_recording = False
+            print(f"Error al guardar el audio: {e}")
     
-    def _save_audio_file(self):
-        if not self.audio_data:
-            return
-            
-        # Concatenar todos los fragmentos de audio
-        audio_array = np.concatenate(self.audio_data, axis=0)
-        
-        # Convertir a int16 para compatibilidad WAV
-        audio_int16 = (audio_array * 32767).astype(np.int16)
-        
-        # Guardar como archivo WAV
-        with wave.open(self.temp_file_path, 'wb') as wav_file:
-            wav_file.setnchannels(self.channels)
-            wav_file.setsampwidth(2)  # 2 bytes para int16
-            wav_file.setframerate(self.sample_rate)
-            wav_file.writeframes(audio_int16.tobytes())
+    def wait_until_saved(self, timeout=None):
+        """Espera a que el WAV de la última grabación esté completo y cerrado."""
+        if self.writer_thread:
+            self.writer_thread.join(timeout)
+        return not (self.writer_thread and self.writer_thread.is_alive())
     
     def get_recording_status(self):
+        saving = bool(self.writer_thread and self.writer_thread.is_alive() and not self.is_recording)
         return {
             'is_recording': self.is_recording,
+            'saving': saving,
+            # El WAV solo está completo (y se puede leer) cuando el escritor lo cerró
+            'saved': bool(self.temp_file_path and not self.is_recording and not saving and self.frames_written),
             'file_path': self.temp_file_path if self.temp_file_path else None,
-            'duration': len(self.audio_data) * 100 / 1000 if self.audio_data else 0 # en segundos
+            'duration': self.frames_captured / self.sample_rate,  # en segundos
+            'frames_written': self.frames_written,
+            'frames_dropped': self.frames_dropped
         }
 
     def cleanup(self):
         if self.is_recording:
             self.stop_recording()
+        # No borrar el archivo mientras el hilo escritor lo tiene abierto
+        self.wait_until_saved()
             
         if self.temp_file_path and os.path.exists(self.temp_file_path):
             try:
@@ -0,0 +1,136 @@
+import threading
+from collections import deque
+from concurrent.futures import Future
+from time import time
+from typing import Callable, List, Optional
+
+import numpy as np
+
+
+class InferenceQueueFullError(Exception):
+    """La cola de inferencia compartida está llena."""
+
+    def __init__(self, retry_after: float):
+        super().__init__("El servidor está analizando demasiados frames; reintenta en unos segundos")
+        self.retry_after = retry_after
+
+
+class BatchInferenceQueue:
+    """Cola compartida que agrupa frames de varios usuarios en lotes.
+
+    Cada request deja su frame con submit() y espera su Future. Un único hilo
+    junta hasta max_batch frames (o lo que llegue en max_wait segundos) y los
+    analiza con una sola llamada a analyze_batch(frames) -> una lista de
+    resultados por frame, como EmotionDetector.detect_emotions_batch.
+    """
+
+    def __init__(self, analyze_batch: Callable[[List[np.ndarray]], List[list]],
+                 max_batch: int = 16, max_wait: float = 0.02, max_queue: int = 64):
+        self.analyze_batch = analyze_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+
+        self._cond = threading.Condition()
+        self._pending = deque()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+        self.frames_analyzed = 0
+        self.frames_rejected = 0
+        self.batches = 0
+        self.last_batch_size = 0
+        self.last_batch_time = 0.0
+
+    def start(self) -> None:
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._loop, name="batch-inference", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._running = False
+            pending = list(self._pending)
+            self._pending.clear()
+            self._cond.notify_all()
+        for _, future in pending:
+            future.cancel()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def submit(self, frame: np.ndarray) -> Future:
+        future: Future = Future()
+        with self._cond:
+            if len(self._pending) >= self.max_queue:
+                self.frames_rejected += 1
+                raise InferenceQueueFullError(self.estimated_wait())
+            self._pending.append((frame, future))
+            self._cond.notify()
+        return future
+
+    def analyze(self, frame: np.ndarray, timeout: Optional[float] = None) -> list:
+        """Encola el frame y bloquea hasta tener sus caras analizadas."""
+        return self.submit(frame).result(timeout=timeout)
+
+    def estimated_wait(self) -> float:
+        batches_ahead = len(self._pending) // self.max_batch + 1
+        return batches_ahead * max(self.last_batch_time, self.max_wait)
+
+    def _next_batch(self) -> list:
+        with self._cond:
+            while self._running and not self._pending:
+                self._cond.wait()
+            if not self._running:
+                return []
+            # Esperar un poco a que lleguen frames de otros usuarios para llenar el lote
+            deadline = time() + self.max_wait
+            while self._running and len(self._pending) < self.max_batch:
+                remaining = deadline - time()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            count = min(len(self._pending), self.max_batch)
+            return [self._pending.popleft() for _ in range(count)]
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            # Requests que ya se cancelaron no ocupan sitio en el lote
+            batch = [(frame, future) for frame, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            start = time()
+            try:
+                results = self.analyze_batch([frame for frame, _ in batch])
+            except Exception as e:
+                print(f"Error en la inferencia por lotes: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.last_batch_time = time() - start
+            self.last_batch_size = len(batch)
+            self.batches += 1
+            self.frames_analyzed += len(batch)
+            for (_, future), faces in zip(batch, results):
+                future.set_result(faces)
+
+    def get_stats(self) -> dict:
+        return {
+            'running': self._running,
+            'queued': len(self._pending),
+            'max_batch': self.max_batch,
+            'batches': self.batches,
+            'frames_analyzed': self.frames_analyzed,
+            'frames_rejected': self.frames_rejected,
+            'avg_batch_size': round(self.frames_analyzed / self.batches, 2) if self.batches else 0.0,
+            'last_batch_size': self.last_batch_size,
+            'last_batch_time': round(self.last_batch_time, 4)
+        }
@@ -0,0 +1,53 @@
+"""Mide el factor de tiempo real (RTF) de cada perfil de transcripción en esta máquina.
+
+Uso:
+    python -m src.benchmark_transcription audio.wav [--runs 3] [--language es]
+
+RTF = tiempo de procesamiento / duración del audio; menor que 1 es más rápido que tiempo real.
+"""
+import argparse
+import os
+from time import time
+
+from faster_whisper import decode_audio
+
+from src.audio_decoding import SAMPLE_RATE
+from src.transcription_service import PROFILES, TranscriptionService
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de perfiles de transcripción")
+    parser.add_argument("audio", help="Archivo de audio de prueba")
+    parser.add_argument("--runs", type=int, default=3, help="Repeticiones por perfil")
+    parser.add_argument("--language", default="es", help="Idioma fijo ('' para detectarlo)")
+    parser.add_argument("--profiles", nargs="*", default=list(PROFILES), help="Perfiles a medir")
+    args = parser.parse_args()
+
+    audio = decode_audio(args.audio, sampling_rate=SAMPLE_RATE)
+    duration = len(audio) / SAMPLE_RATE
+    print(f"Audio: {args.audio} ({duration:.1f}s), CPU: {os.cpu_count()} núcleos\n")
+
+    service = TranscriptionService(num_workers=1, language=args.language or None)
+    print(f"{'perfil':<10} {'modelo':<8} {'carga':>8} {'media':>8} {'RTF':>6}")
+    for profile in args.profiles:
+        model_size, _ = service.resolve(profile)
+
+        start = time()
+        service.get_model(model_size)
+        load_time = time() - start
+
+        # Una pasada de calentamiento fuera de la medición
+        service.transcribe(audio, profile)
+        times = []
+        for _ in range(args.runs):
+            start = time()
+            text, _ = service.transcribe(audio, profile)
+            times.append(time() - start)
+
+        mean = sum(times) / len(times)
+        print(f"{profile:<10} {model_size:<8} {load_time:>7.2f}s {mean:>7.2f}s {mean / duration:>6.3f}")
+        print(f"    {text.strip()[:80]}")
+
+
+if __name__ == "__main__":
+    main()
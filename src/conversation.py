@@ -0,0 +1,67 @@
+from typing import Callable, Dict, List, Optional
+
+
+def estimate_tokens(text: str) -> int:
+    # Aproximación suficiente para presupuestar: ~4 caracteres por token
+    return len(text) // 4 + 1
+
+
+class Conversation:
+    """Estado de una conversación con presupuesto de tokens.
+
+    Los turnos recientes se conservan textuales; cuando superan token_budget,
+    los más viejos se compactan en un resumen acumulado (summary) mediante el
+    callable summarize(summary_anterior, turnos) -> nuevo_resumen.
+    """
+
+    def __init__(self, token_budget: int = 800, keep_recent: int = 2):
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.summary = ""
+        self.turns: List[Dict[str, str]] = []
+        self.question_count = 1
+
+    def add(self, role: str, text: str) -> None:
+        self.turns.append({"role": role, "text": text})
+
+    @property
+    def last_role(self) -> Optional[str]:
+        return self.turns[-1]["role"] if self.turns else None
+
+    def compact(self, summarize: Callable[[str, List[Dict[str, str]]], str]) -> None:
+        """Resume los turnos más viejos si los recientes exceden el presupuesto."""
+        total = sum(estimate_tokens(turn["text"]) for turn in self.turns)
+        old = []
+        while total > self.token_budget and len(self.turns) > self.keep_recent:
+            turn = self.turns.pop(0)
+            total -= estimate_tokens(turn["text"])
+            old.append(turn)
+        if old:
+            try:
+                self.summary = summarize(self.summary, old)
+            except Exception as e:
+                # Sin resumen nuevo se conservan los turnos para no perder contexto
+                print(f"⚠️ Error al resumir la conversación: {e}")
+                self.turns = old + self.turns
+
+    def context_text(self) -> str:
+        lines = []
+        if self.summary:
+            lines.append(f"RESUMEN DE LO ANTERIOR: {self.summary}")
+        lines.extend(f"{turn['role'].upper()}: {turn['text']}" for turn in self.turns)
+        return "\n".join(lines)
+
+    def to_dict(self) -> dict:
+        return {
+            "summary": self.summary,
+            "turns": self.turns,
+            "question_count": self.question_count
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, **kwargs) -> "Conversation":
+        conversation = cls(**kwargs)
+        conversation.summary = data.get("summary", "")
+        conversation.turns = list(data.get("turns", []))
+        conversation.question_count = data.get("question_count", 1)
+        return conversation
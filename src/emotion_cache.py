@@ -0,0 +1,83 @@
+import threading
+from collections import OrderedDict
+from time import time
+from typing import Dict, Optional
+import cv2
+import numpy as np
+
+
+class EmotionCache:
+    """Caché LRU con TTL de resultados de emociones indexada por miniatura de la cara.
+
+    La llave es una miniatura 12x12 en grises de la entrada 48x48 del
+    clasificador; dos llaves cuyas celdas difieren como mucho en max_distance
+    niveles de gris se consideran la misma cara y se reutiliza el resultado
+    anterior sin correr el modelo. Un cambio de expresión (boca, cejas) mueve
+    varias celdas bastante más que el ruido del sensor.
+    """
+
+    def __init__(self, capacity: int = 64, ttl: float = 10.0, max_distance: int = 12):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.max_distance = max_distance
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def fingerprint(image) -> bytes:
+        """Miniatura 12x12 (promedio de bloques 4x4 de la entrada 48x48) en grises."""
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        if gray.shape != (48, 48):
+            gray = cv2.resize(gray, (48, 48))
+        return cv2.resize(gray, (12, 12), interpolation=cv2.INTER_AREA).tobytes()
+
+    @staticmethod
+    def distance(a: bytes, b: bytes) -> int:
+        """Mayor diferencia entre celdas de dos miniaturas."""
+        diff = np.frombuffer(a, dtype=np.uint8).astype(np.int16) - np.frombuffer(b, dtype=np.uint8)
+        return int(np.abs(diff).max())
+
+    def get(self, key: bytes) -> Optional[Dict[str, float]]:
+        now = time()
+        with self._lock:
+            match, best = None, self.max_distance + 1
+            for stored_key in list(self._entries):
+                value, stored_at = self._entries[stored_key]
+                if now - stored_at > self.ttl:
+                    del self._entries[stored_key]
+                    continue
+                # La entrada más parecida, no la primera que entra en el umbral
+                distance = self.distance(stored_key, key)
+                if distance < best:
+                    match, best = stored_key, distance
+
+            if match is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(match)
+            self.hits += 1
+            return self._entries[match][0]
+
+    def put(self, key: bytes, value: Dict[str, float]) -> None:
+        with self._lock:
+            self._entries[key] = (value, time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0
+        }
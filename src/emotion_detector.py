@@ -1,14 +1,43 @@
+import threading
 from time import time
-from typing import Optional, Tuple, Dict
+from typing import Optional, Tuple, Dict, List
 import cv2
-from deepface import DeepFace
+import numpy as np
+from src.face_tracker import FaceTracker
+from src.analysis_scheduler import AnalysisScheduler
+from src.emotion_cache import EmotionCache
+
+# Mismo orden de salida que el modelo de emociones de DeepFace
+EMOTION_LABELS = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
 
 
 class EmotionDetector:
-    def __init__(self, webcam_index: int = 0):
+    def __init__(self, webcam_index: int = 0, detector_backend: str = 'opencv', warmup: bool = True,
+                 use_tracking: bool = True):
         self.webcam_index = webcam_index
         self.cap: Optional[cv2.VideoCapture] = None
 
+        # Backend de detección de caras de DeepFace: opencv, ssd, yunet, mtcnn, retinaface...
+        self.detector_backend = detector_backend
+        self.emotion_model = None
+        self.face_detector = None
+        # El CascadeClassifier de OpenCV y el modelo de Keras no admiten llamadas
+        # simultáneas: la cámara del servidor y la cola de lotes los comparten
+        self._model_lock = threading.Lock()
+        # Seguimiento de la cara entre análisis para no detectar en cada llamada
+        self.tracker: Optional[FaceTracker] = FaceTracker() if use_tracking else None
+        # Frecuencia de análisis adaptativa según latencia, carga de CPU y cambios en la escena
+        self.scheduler = AnalysisScheduler()
+        # Resultados recientes por hash perceptual: evita el modelo si la cara no cambió
+        self.cache = EmotionCache()
+        # Tiempos (segundos) de la última llamada a detect_emotion
+        self.last_timing: Dict[str, float] = {}
+        # Tiempos del último lote de detect_emotions_batch (frames del navegador)
+        self.last_batch_timing: Dict[str, float] = {}
+        self.load_time = 0.0
+        # Motivo por el que no se pudieron cargar los modelos (None si cargaron)
+        self.load_error: Optional[str] = None
+
         self.colors = {
             'angry': (0, 0, 255),
             'disgust': (128, 0, 128),
@@ -20,6 +49,34 @@ class EmotionDetector:
         }
 
         self.setup_camera()
+        self.load_models()
+        if warmup:
+            self.warmup()
+
+    def load_models(self) -> None:
+        """Construye una sola vez el clasificador de emociones y el detector de caras."""
+        start = time()
+        try:
+            # DeepFace (y con él TensorFlow) se importa aquí, no al importar este módulo
+            from deepface import DeepFace
+            from deepface.detectors import FaceDetector
+            self.emotion_model = DeepFace.build_model('Emotion')
+            self.face_detector = FaceDetector.build_model(self.detector_backend)
+            self.load_time = time() - start
+            print(f"Modelos de emociones cargados ({self.detector_backend}) en {self.load_time:.2f}s")
+        except Exception as e:
+            print(f"Error al cargar los modelos de emociones: {e}")
+            self.load_error = str(e)
+            self.emotion_model = None
+            self.face_detector = None
+
+    def warmup(self) -> None:
+        """Inferencia de calentamiento para no pagar la inicialización en el primer análisis."""
+        if self.emotion_model is None:
+            return
+        dummy = np.zeros((480, 640, 3), dtype=np.uint8)
+        self.detect_emotion(dummy)
+        print(f"Calentamiento del modelo completado en {self.last_timing.get('total', 0.0):.2f}s")
 
     def setup_camera(self) -> None:
         try:
@@ -33,6 +90,45 @@ class EmotionDetector:
             print(f"Error al configurar la cámara: {e}")
             self.cap = None
 
+    def detect_faces(self, frame) -> List[Tuple[int, int, int, int]]:
+        """Devuelve las cajas (x, y, w, h) de las caras encontradas con el detector precargado."""
+        from deepface.detectors import FaceDetector
+        with self._model_lock:
+            faces = FaceDetector.detect_faces(self.face_detector, self.detector_backend, frame, align=False)
+        height, width = frame.shape[:2]
+        boxes = []
+        for _, (x, y, w, h), _ in faces:
+            x, y = max(int(x), 0), max(int(y), 0)
+            w, h = min(int(w), width - x), min(int(h), height - y)
+            if w > 0 and h > 0:
+                boxes.append((x, y, w, h))
+        return boxes
+
+    @staticmethod
+    def prepare_face(crop: np.ndarray) -> np.ndarray:
+        """Entrada del clasificador: el recorte en grises a 48x48 (si ya lo está, sin cambios)."""
+        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+        return gray if gray.shape == (48, 48) else cv2.resize(gray, (48, 48))
+
+    def classify_faces(self, crops: List[np.ndarray]) -> List[Dict[str, float]]:
+        """Clasifica un lote de recortes BGR (o ya preparados) en una sola llamada al modelo."""
+        if not crops:
+            return []
+        batch = np.stack([self.prepare_face(crop) for crop in crops]).astype(np.float32) / 255.0
+        # Llamada directa al modelo: predict() arma un data handler en cada llamada,
+        # que cuesta más que esta CNN con uno o pocos recortes de 48x48
+        with self._model_lock:
+            predictions = self.emotion_model(batch[..., np.newaxis], training=False).numpy()
+
+        results = []
+        for prediction in predictions:
+            total = float(prediction.sum()) or 1.0
+            results.append({
+                label: 100 * float(prediction[i]) / total
+                for i, label in enumerate(EMOTION_LABELS)
+            })
+        return results
+
     def detect_emotion(self, frame) -> Tuple[str, float, Dict[str, float]]:
         """
             frame: imagen (BGR) proporcionada por OpenCV
@@ -41,29 +137,162 @@ class EmotionDetector:
             (dominant_emotion, confidence, all_emotions)
         """
         try:
-            result = DeepFace.analyze(
-                frame,
-                actions=['emotion'],
-                enforce_detection=False,
-                silent=True,
-            )
-
-            # DeepFace puede retornar una lista si detecta varias caras
-            if isinstance(result, list) and len(result) > 0:
-                emotions = result[0].get('emotion', {})
+            start = time()
+            if self.emotion_model is None:
+                # Sin modelos precargados solo se puede cachear por frame completo
+                key = self.cache.fingerprint(frame)
+                emotions = self.cache.get(key)
+                if emotions is not None:
+                    self.last_timing = {'total': time() - start, 'cached': 1.0}
+                    return self._dominant(emotions)
+
+                # Camino lento de DeepFace
+                from deepface import DeepFace
+                with self._model_lock:
+                    result = DeepFace.analyze(
+                        frame,
+                        actions=['emotion'],
+                        enforce_detection=False,
+                        silent=True,
+                    )
+
+                # DeepFace puede retornar una lista si detecta varias caras
+                if isinstance(result, list) and len(result) > 0:
+                    emotions = result[0].get('emotion', {})
+                else:
+                    emotions = result.get('emotion', {}) if isinstance(result, dict) else {}
+                if emotions:
+                    self.cache.put(key, emotions)
+                self.last_timing = {'total': time() - start, 'cached': 0.0}
             else:
-                emotions = result.get('emotion', {}) if isinstance(result, dict) else {}
+                box = self.tracker.track(frame) if self.tracker else None
+                if box:
+                    boxes = [box]
+                else:
+                    boxes = self.detect_faces(frame)
+                    if self.tracker:
+                        if boxes:
+                            self.tracker.init(frame, boxes[0])
+                        else:
+                            self.tracker.reset()
+                detect_time = time() - start
+
+                # Igual que enforce_detection=False: sin cara se analiza el frame completo
+                if boxes:
+                    x, y, w, h = boxes[0]
+                    crop = frame[y:y + h, x:x + w]
+                else:
+                    crop = frame
 
-            if not emotions:
-                return 'neutral', 0.0, {}
+                # La llave de la caché sale de la misma entrada 48x48 que ve el modelo
+                face = self.prepare_face(crop)
+                key = self.cache.fingerprint(face)
+                emotions = self.cache.get(key)
+                cached = emotions is not None
+                if not cached:
+                    emotions = self.classify_faces([face])[0]
+                    self.cache.put(key, emotions)
+                total_time = time() - start
+                self.last_timing = {
+                    'detect': detect_time,
+                    'classify': total_time - detect_time,
+                    'total': total_time,
+                    'tracked': 1.0 if box else 0.0,
+                    'cached': 1.0 if cached else 0.0
+                }
 
-            dominant_emotion = max(emotions, key=emotions.get)
-            dominant_confidence = float(emotions[dominant_emotion])
-            return dominant_emotion, dominant_confidence, emotions
+            return self._dominant(emotions)
         except Exception as e:
             print(f"Error al detectar emociones: {e}")
             return 'neutral', 0.0, {}
 
+    @staticmethod
+    def _dominant(emotions: Dict[str, float]) -> Tuple[str, float, Dict[str, float]]:
+        if not emotions:
+            return 'neutral', 0.0, {}
+
+        dominant_emotion = max(emotions, key=emotions.get)
+        dominant_confidence = float(emotions[dominant_emotion])
+        return dominant_emotion, dominant_confidence, emotions
+
+    def detect_emotions_batch(self, frames: List[np.ndarray], enforce_detection: bool = False,
+                              max_batch_size: int = 32) -> List[List[dict]]:
+        """Analiza todas las caras de varios frames con una sola pasada del clasificador por lote.
+
+        Returns:
+            una lista por frame con un dict por cara:
+            {'region': {'x', 'y', 'w', 'h'}, 'emotion', 'confidence', 'all_emotions'}
+        """
+        results: List[List[dict]] = [[] for _ in frames]
+        if self.emotion_model is None:
+            # Sin modelos precargados: DeepFace frame por frame
+            from deepface import DeepFace
+            for i, frame in enumerate(frames):
+                try:
+                    with self._model_lock:
+                        faces = DeepFace.analyze(frame, actions=['emotion'],
+                                                 enforce_detection=enforce_detection, silent=True)
+                except Exception as e:
+                    print(f"Error al detectar emociones: {e}")
+                    continue
+                for face in faces if isinstance(faces, list) else [faces]:
+                    emotions = face.get('emotion', {})
+                    if emotions:
+                        results[i].append(self._face_result(face.get('region', {}), emotions))
+            return results
+
+        start = time()
+        crops, owners = [], []
+        for i, frame in enumerate(frames):
+            try:
+                boxes = self.detect_faces(frame)
+            except Exception as e:
+                print(f"Error al detectar caras: {e}")
+                boxes = []
+            if not boxes and not enforce_detection:
+                height, width = frame.shape[:2]
+                boxes = [(0, 0, width, height)]
+            for x, y, w, h in boxes:
+                crops.append(frame[y:y + h, x:x + w])
+                owners.append((i, {'x': x, 'y': y, 'w': w, 'h': h}))
+        detect_time = time() - start
+
+        # Todas las caras del lote se apilan y se clasifican juntas
+        for offset in range(0, len(crops), max_batch_size):
+            chunk = crops[offset:offset + max_batch_size]
+            for (i, region), emotions in zip(owners[offset:offset + max_batch_size], self.classify_faces(chunk)):
+                results[i].append(self._face_result(region, emotions))
+
+        total_time = time() - start
+        self.last_batch_timing = {
+            'detect': detect_time,
+            'classify': total_time - detect_time,
+            'total': total_time,
+            'frames': len(frames),
+            'faces': len(crops)
+        }
+        return results
+
+    @staticmethod
+    def _face_result(region: dict, emotions: Dict[str, float]) -> dict:
+        dominant_emotion = max(emotions, key=emotions.get)
+        return {
+            'region': {k: int(region.get(k, 0)) for k in ('x', 'y', 'w', 'h')},
+            'emotion': dominant_emotion,
+            'confidence': float(emotions[dominant_emotion]),
+            'all_emotions': emotions
+        }
+
+    def get_model_stats(self) -> dict:
+        return {
+            'detector_backend': self.detector_backend,
+            'models_loaded': self.emotion_model is not None,
+            'load_time': round(self.load_time, 3),
+            'last_timing': {k: round(v, 4) for k, v in self.last_timing.items()},
+            'last_batch_timing': {k: round(v, 4) for k, v in self.last_batch_timing.items()},
+            'tracker': self.tracker.get_stats() if self.tracker else None
+        }
+
     def draw_results(self, frame, emotion: str, confidence: float, all_emotions: Optional[Dict[str, float]] = None) -> None:
         color = self.colors.get(emotion.lower(), (255, 255, 255))
         # Emoción principal
@@ -80,7 +309,6 @@ class EmotionDetector:
             print("Captura de vídeo no inicializada. Saliendo...")
             return
 
-        last_analysis_time = 0.0
         emotion, confidence, all_emotions = 'neutral', 0.0, {}
 
         try:
@@ -92,9 +320,9 @@ class EmotionDetector:
 
                 frame = cv2.flip(frame, 1)
                 current_time = time()
-                if current_time - last_analysis_time > 3.0:
+                if self.scheduler.should_analyze(frame, current_time):
                     emotion, confidence, all_emotions = self.detect_emotion(frame)
-                    last_analysis_time = current_time
+                    self.scheduler.record_latency(time() - current_time)
 
                 # Dibujar resultados sobre el mismo frame
                 self.draw_results(frame, emotion, confidence, all_emotions)
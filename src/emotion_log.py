@@ -0,0 +1,184 @@
+import json
+import math
+import os
+import threading
+from datetime import datetime
+from time import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Orden fijo de las emociones de DeepFace; el log guarda solo el índice
+EMOTIONS = ('angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral')
+EMOTION_INDEX = {name: i for i, name in enumerate(EMOTIONS)}
+
+
+class EmotionLog:
+    """Historial de emociones de una sesión.
+
+    La fuente de verdad es un buffer circular en memoria de capacidad fija
+    (índice de emoción + timestamp + puntajes). Para durabilidad, cada detección
+    se agrega a un journal JSON-lines que se escribe en lotes y nunca se reescribe.
+
+    Además mantiene agregados de toda la sesión (conteos, confianza media y un
+    estado de ánimo reciente con decaimiento exponencial) que se actualizan en
+    cada append, de modo que summary() cuesta O(1) sin importar la duración.
+    """
+
+    def __init__(self, journal_path: Optional[str] = None, capacity: int = 200,
+                 batch_size: int = 10, flush_interval: float = 5.0,
+                 mood_half_life: float = 30.0):
+        self.capacity = capacity
+        # Vida media (segundos) del estado de ánimo reciente
+        self.mood_half_life = mood_half_life
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._ids = np.zeros(capacity, dtype=np.int8)
+        self._timestamps = np.zeros(capacity, dtype=np.float64)
+        self._scores = np.zeros((capacity, len(EMOTIONS)), dtype=np.float32)
+        self._next = 0
+        self._size = 0
+
+        self._reset_aggregates()
+
+        self._pending: List[str] = []
+        self._last_flush = time()
+
+        self.journal_path = journal_path
+        self.session_id = os.path.basename(journal_path) if journal_path else None
+        self.session_start = datetime.now().isoformat()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _reset_aggregates(self) -> None:
+        self._total = 0
+        self._counts = np.zeros(len(EMOTIONS), dtype=np.int64)
+        self._confidence_sums = np.zeros(len(EMOTIONS), dtype=np.float64)
+        self._mood = np.zeros(len(EMOTIONS), dtype=np.float64)
+        self._mood_time = None
+
+    def _update_aggregates(self, emotion_id: int, timestamp: float, scores: np.ndarray) -> None:
+        self._total += 1
+        self._counts[emotion_id] += 1
+        self._confidence_sums[emotion_id] += scores[emotion_id]
+
+        # Decaer el estado de ánimo acumulado según el tiempo transcurrido
+        if self._mood_time is not None and timestamp > self._mood_time:
+            self._mood *= math.pow(0.5, (timestamp - self._mood_time) / self.mood_half_life)
+        self._mood += scores / 100.0
+        self._mood_time = max(timestamp, self._mood_time or timestamp)
+
+    def append(self, emotion: str, timestamp: float, all_emotions: Optional[Dict[str, float]] = None) -> None:
+        """Agrega una detección en O(1)."""
+        emotion_id = EMOTION_INDEX.get(emotion, EMOTION_INDEX['neutral'])
+        all_emotions = all_emotions or {}
+
+        with self._lock:
+            i = self._next
+            self._ids[i] = emotion_id
+            self._timestamps[i] = timestamp
+            self._scores[i] = [all_emotions.get(name, 0.0) for name in EMOTIONS]
+            self._update_aggregates(emotion_id, timestamp, self._scores[i].astype(np.float64))
+            self._next = (i + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+            if self.journal_path:
+                self._pending.append(json.dumps({
+                    'emotion': EMOTIONS[emotion_id],
+                    'timestamp': timestamp,
+                    'all_emotions': {name: round(float(all_emotions.get(name, 0.0)), 4) for name in EMOTIONS}
+                }, ensure_ascii=False))
+                if len(self._pending) >= self.batch_size or time() - self._last_flush >= self.flush_interval:
+                    self._flush_locked()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        self._last_flush = time()
+        if not self._pending or not self.journal_path:
+            return
+        try:
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write('\n'.join(self._pending) + '\n')
+            self._pending = []
+        except Exception as e:
+            print(f"Error al escribir el journal de emociones: {e}")
+
+    def reset(self, journal_path: Optional[str] = None) -> None:
+        """Vacía el historial y empieza un journal nuevo (el anterior se descarta)."""
+        with self._lock:
+            self._pending = []
+            self._next = 0
+            self._size = 0
+            self._reset_aggregates()
+            self._last_flush = time()
+            self.journal_path = journal_path
+            self.session_id = os.path.basename(journal_path) if journal_path else None
+            self.session_start = datetime.now().isoformat()
+
+    def _order(self) -> np.ndarray:
+        # Índices del más viejo al más nuevo
+        start = (self._next - self._size) % self.capacity
+        return (start + np.arange(self._size)) % self.capacity
+
+    def entries(self) -> List[dict]:
+        with self._lock:
+            order = self._order()
+            ids = self._ids[order]
+            timestamps = self._timestamps[order]
+            scores = self._scores[order]
+
+        return [
+            {
+                'emotion': EMOTIONS[emotion_id],
+                'timestamp': float(ts),
+                'all_emotions': {name: round(float(v), 4) for name, v in zip(EMOTIONS, row)}
+            }
+            for emotion_id, ts, row in zip(ids, timestamps, scores)
+        ]
+
+    def summary(self) -> dict:
+        """Resumen de la sesión a partir de los agregados incrementales."""
+        with self._lock:
+            total = self._total
+            counts = self._counts.copy()
+            confidence_sums = self._confidence_sums.copy()
+            mood = self._mood.copy()
+
+        if not total:
+            return {
+                'total': 0,
+                'counts': {},
+                'percentages': {'neutral': 100.0},
+                'mean_confidence': {},
+                'recent_mood': {'neutral': 100.0},
+                'dominant_recent': 'neutral'
+            }
+
+        seen = [i for i in range(len(EMOTIONS)) if counts[i]]
+        mood_total = mood.sum()
+        recent_mood = {
+            EMOTIONS[i]: round(float(mood[i] / mood_total) * 100, 1)
+            for i in range(len(EMOTIONS)) if mood[i] > 0
+        } if mood_total > 0 else {'neutral': 100.0}
+
+        return {
+            'total': int(total),
+            'counts': {EMOTIONS[i]: int(counts[i]) for i in seen},
+            'percentages': {EMOTIONS[i]: round((counts[i] / total) * 100, 1) for i in seen},
+            'mean_confidence': {EMOTIONS[i]: round(float(confidence_sums[i] / counts[i]), 2) for i in seen},
+            'recent_mood': recent_mood,
+            'dominant_recent': max(recent_mood, key=recent_mood.get)
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            'session_id': self.session_id,
+            'session_start': self.session_start,
+            'emotions': self.entries()
+        }
@@ -0,0 +1,92 @@
+import json
+import threading
+from queue import Queue, Empty, Full
+from typing import Optional
+
+
+def sse_event(data, event=None) -> str:
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class EventBroadcaster:
+    """Reparte eventos Server-Sent Events a todos los clientes suscritos.
+
+    Cada evento se serializa una sola vez y los mismos bytes se dejan en la
+    cola acotada de cada cliente; si un cliente no consume, se descartan sus
+    eventos más viejos sin frenar al que publica.
+    """
+
+    def __init__(self, queue_size: int = 16):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+        self.events_published = 0
+        self.events_dropped = 0
+
+    def subscribe(self) -> Queue:
+        q = Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q: Queue) -> None:
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def publish(self, data, event=None) -> None:
+        self.publish_message(sse_event(data, event).encode("utf-8"))
+
+    def publish_message(self, message: Optional[bytes]) -> None:
+        """Entrega un evento ya serializado (None cierra los streams)."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        if not subscribers:
+            return
+        self.events_published += 1
+        for q in subscribers:
+            try:
+                q.put_nowait(message)
+            except Full:
+                try:
+                    q.get_nowait()
+                    self.events_dropped += 1
+                except Empty:
+                    pass
+                try:
+                    q.put_nowait(message)
+                except Full:
+                    pass
+
+    def stream(self, initial: bytes = b"", keepalive: float = 15.0):
+        """Generador para un cliente: initial primero y luego cada evento publicado."""
+        q = self.subscribe()
+        try:
+            if initial:
+                yield initial
+            while True:
+                try:
+                    message = q.get(timeout=keepalive)
+                except Empty:
+                    # Comentario SSE: mantiene viva la conexión a través de proxies
+                    yield b": keepalive\n\n"
+                    continue
+                if message is None:
+                    break
+                yield message
+        finally:
+            self.unsubscribe(q)
+
+    def close(self) -> None:
+        self.publish_message(None)
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def get_stats(self) -> dict:
+        return {
+            'clients': len(self._subscribers),
+            'events_published': self.events_published,
+            'events_dropped': self.events_dropped
+        }
@@ -0,0 +1,82 @@
+from typing import Optional, Tuple
+import cv2
+import numpy as np
+
+Box = Tuple[int, int, int, int]
+
+
+class FaceTracker:
+    """Seguimiento ligero de una cara entre análisis por template matching.
+
+    Tras una detección completa se guarda el recorte de la cara; en los análisis
+    siguientes solo se busca ese recorte en una ventana alrededor de la última
+    posición. Si la correlación cae por debajo de min_score, o se alcanzaron
+    redetect_every seguimientos seguidos, track() devuelve None y hay que volver
+    a detectar.
+    """
+
+    def __init__(self, min_score: float = 0.6, redetect_every: int = 10, search_margin: float = 0.5):
+        self.min_score = min_score
+        self.redetect_every = redetect_every
+        self.search_margin = search_margin
+
+        self.box: Optional[Box] = None
+        self._template: Optional[np.ndarray] = None
+        self._tracked_since_detect = 0
+
+        self.last_score = 0.0
+        self.tracked = 0
+        self.detections = 0
+
+    def reset(self) -> None:
+        self.box = None
+        self._template = None
+        self._tracked_since_detect = 0
+
+    def init(self, frame, box: Box) -> None:
+        """Reinicia el seguimiento con una caja recién detectada."""
+        x, y, w, h = box
+        self.box = box
+        self._template = cv2.cvtColor(frame[y:y + h, x:x + w], cv2.COLOR_BGR2GRAY)
+        self._tracked_since_detect = 0
+        self.last_score = 1.0
+        self.detections += 1
+
+    def track(self, frame) -> Optional[Box]:
+        if self.box is None or self._template is None:
+            return None
+        if self._tracked_since_detect >= self.redetect_every:
+            # Re-detección periódica aunque el seguimiento vaya bien
+            return None
+
+        x, y, w, h = self.box
+        height, width = frame.shape[:2]
+        mx, my = int(w * self.search_margin), int(h * self.search_margin)
+        x0, y0 = max(x - mx, 0), max(y - my, 0)
+        x1, y1 = min(x + w + mx, width), min(y + h + my, height)
+        if x1 - x0 < w or y1 - y0 < h:
+            self.reset()
+            return None
+
+        window = cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2GRAY)
+        scores = cv2.matchTemplate(window, self._template, cv2.TM_CCOEFF_NORMED)
+        _, max_score, _, (dx, dy) = cv2.minMaxLoc(scores)
+        self.last_score = float(max_score)
+        if max_score < self.min_score:
+            self.reset()
+            return None
+
+        self.box = (x0 + dx, y0 + dy, w, h)
+        # Actualizar el template para seguir cambios graduales de pose e iluminación
+        self._template = window[dy:dy + h, dx:dx + w].copy()
+        self._tracked_since_detect += 1
+        self.tracked += 1
+        return self.box
+
+    def get_stats(self) -> dict:
+        return {
+            'tracking': self.box is not None,
+            'last_score': round(self.last_score, 3),
+            'tracked': self.tracked,
+            'detections': self.detections
+        }
@@ -0,0 +1,27 @@
+import cv2
+import numpy as np
+
+
+class InvalidFrameError(ValueError):
+    """Los bytes recibidos no son una imagen que OpenCV pueda decodificar."""
+
+
+def decode_frame(data, max_side: int = 640) -> np.ndarray:
+    """Decodifica un frame JPEG/WebP subido por el navegador a una imagen BGR.
+
+    np.frombuffer envuelve los bytes del request sin copiarlos e imdecode
+    escribe directo en la imagen de salida. Si el navegador no redujo el
+    frame, se reduce aquí para que el lado mayor no pase de max_side.
+    """
+    encoded = np.frombuffer(data, dtype=np.uint8)
+    if encoded.size == 0:
+        raise InvalidFrameError("Frame vacío")
+    frame = cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+    if frame is None:
+        raise InvalidFrameError("No se pudo decodificar el frame (se espera JPEG o WebP)")
+
+    height, width = frame.shape[:2]
+    scale = max_side / max(height, width)
+    if scale < 1:
+        frame = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+    return frame
@@ -0,0 +1,129 @@
+import threading
+from queue import Queue, Empty, Full
+from time import time
+from typing import Callable, Optional
+
+
+class FrameHub:
+    """Lee la cámara una sola vez y reparte cada frame codificado a todos los clientes.
+
+    produce_frame() se llama desde un único hilo de captura y debe devolver los
+    bytes JPEG del frame, b'' si no hay nada que enviar esta vez (p. ej. por el
+    límite de FPS) o None si la fuente terminó. Cada suscriptor tiene su
+    propia cola acotada: si un cliente es lento se descartan sus frames viejos,
+    sin frenar a los demás ni a la captura.
+    """
+
+    def __init__(self, produce_frame: Callable[[], Optional[bytes]], queue_size: int = 2):
+        self.produce_frame = produce_frame
+        self.queue_size = queue_size
+
+        self._lock = threading.Lock()
+        # Cola de cada cliente -> sus contadores (bytes y frames entregados, descartes)
+        self._subscribers = {}
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+        self.frames_produced = 0
+        self.frames_dropped = 0
+
+    def subscribe(self) -> Queue:
+        q = Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers[q] = {'started': time(), 'bytes': 0, 'frames': 0, 'dropped': 0}
+            self._running = True
+            # Si el hilo anterior aún no terminó, simplemente sigue trabajando
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="frame-hub", daemon=True)
+                self._thread.start()
+        return q
+
+    def unsubscribe(self, q: Queue) -> None:
+        with self._lock:
+            self._subscribers.pop(q, None)
+            # Sin clientes no tiene sentido seguir leyendo la cámara
+            if not self._subscribers:
+                self._running = False
+
+    def stream(self, timeout: float = 5.0):
+        """Generador para un cliente: entrega los frames hasta que la fuente termine."""
+        q = self.subscribe()
+        try:
+            while True:
+                try:
+                    frame_bytes = q.get(timeout=timeout)
+                except Empty:
+                    continue
+                if frame_bytes is None:
+                    break
+                stats = self._subscribers.get(q)
+                if stats is not None:
+                    stats['bytes'] += len(frame_bytes)
+                    stats['frames'] += 1
+                yield frame_bytes
+        finally:
+            self.unsubscribe(q)
+
+    def _publish(self, frame_bytes: Optional[bytes]) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+        for q, stats in subscribers:
+            try:
+                q.put_nowait(frame_bytes)
+            except Full:
+                # Cliente lento: descartar el frame más viejo y dejar el nuevo
+                try:
+                    q.get_nowait()
+                    self.frames_dropped += 1
+                    stats['dropped'] += 1
+                except Empty:
+                    pass
+                try:
+                    q.put_nowait(frame_bytes)
+                except Full:
+                    pass
+
+    def _loop(self) -> None:
+        while True:
+            with self._lock:
+                if not self._running:
+                    self._thread = None
+                    return
+            try:
+                frame_bytes = self.produce_frame()
+            except Exception as e:
+                print(f"Error en la captura compartida: {e}")
+                frame_bytes = None
+
+            if frame_bytes is None:
+                # Fuente terminada: detener el hilo y avisar a los clientes
+                with self._lock:
+                    self._running = False
+                    self._thread = None
+                self._publish(None)
+                return
+
+            if frame_bytes:
+                self.frames_produced += 1
+                self._publish(frame_bytes)
+
+    def get_stats(self) -> dict:
+        now = time()
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+        streams = []
+        for stats in subscribers:
+            elapsed = max(now - stats['started'], 1e-6)
+            streams.append({
+                'seconds': round(elapsed, 1),
+                'fps': round(stats['frames'] / elapsed, 2),
+                'bitrate_kbps': round(stats['bytes'] * 8 / 1000 / elapsed, 1),
+                'dropped': stats['dropped']
+            })
+        return {
+            'running': self._running,
+            'clients': len(subscribers),
+            'frames_produced': self.frames_produced,
+            'frames_dropped': self.frames_dropped,
+            'streams': streams
+        }
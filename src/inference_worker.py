@@ -0,0 +1,90 @@
+import threading
+from time import time
+from typing import Callable, Optional, Tuple, Dict
+
+
+class InferenceWorker:
+    """Hilo de inferencia con un buffer de un solo slot ("el último gana").
+
+    El productor (el streaming de video) deja frames con submit() sin bloquearse;
+    el hilo siempre analiza el frame más reciente y descarta los intermedios.
+    Cada resultado se publica mediante on_result(emotion, confidence, all_emotions, timestamp).
+    """
+
+    def __init__(self, analyze: Callable[..., Tuple[str, float, Dict[str, float]]],
+                 on_result: Callable[[str, float, Dict[str, float], float], None]):
+        self.analyze = analyze
+        self.on_result = on_result
+
+        self._cond = threading.Condition()
+        self._pending = None
+        self._pending_time = 0.0
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+        self.busy = False
+        self.frames_submitted = 0
+        self.frames_dropped = 0
+        self.frames_analyzed = 0
+        self.last_inference_time = 0.0
+
+    def start(self) -> None:
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._loop, name="inference-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._running = False
+            self._pending = None
+            self._cond.notify_all()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def submit(self, frame, timestamp: Optional[float] = None) -> None:
+        """Reemplaza el frame pendiente; nunca bloquea al productor."""
+        with self._cond:
+            if self._pending is not None:
+                self.frames_dropped += 1
+            # Copia propia: el productor sigue dibujando sobre su frame
+            self._pending = frame.copy()
+            self._pending_time = timestamp if timestamp is not None else time()
+            self.frames_submitted += 1
+            self._cond.notify()
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                while self._running and self._pending is None:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                frame, timestamp = self._pending, self._pending_time
+                self._pending = None
+                self.busy = True
+
+            try:
+                start = time()
+                emotion, confidence, all_emotions = self.analyze(frame)
+                self.last_inference_time = time() - start
+                self.frames_analyzed += 1
+                self.on_result(emotion, confidence, all_emotions, timestamp)
+            except Exception as e:
+                print(f"Error en el hilo de inferencia: {e}")
+            finally:
+                with self._cond:
+                    self.busy = False
+
+    def get_stats(self) -> dict:
+        return {
+            'running': self._running,
+            'busy': self.busy,
+            'frames_submitted': self.frames_submitted,
+            'frames_dropped': self.frames_dropped,
+            'frames_analyzed': self.frames_analyzed,
+            'last_inference_time': round(self.last_inference_time, 4)
+        }
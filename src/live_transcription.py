@@ -0,0 +1,177 @@
+"""Transcripción en vivo del micrófono del servidor.
+
+Uso:
+    python -m src.live_transcription [--profile fast]
+
+Imprime cada frase en cuanto el hablante hace una pausa, con la latencia desde
+el fin de la voz hasta el texto. Ctrl+C para terminar.
+"""
+import argparse
+import queue
+import threading
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from src.audio_decoding import SAMPLE_RATE
+from src.audio_recorder import AudioRecorder
+from src.streaming_transcription import StreamingTranscription
+from src.transcription_service import TranscriptionService
+
+
+class Resampler:
+    """Remuestreo por bloques (p. ej. 44.1 kHz -> 16 kHz) sin cortes entre bloques.
+
+    Un FIR pasa-bajos (sinc con ventana de Hamming) evita el aliasing al bajar
+    la frecuencia y luego se interpola linealmente en las posiciones de salida.
+    El filtro y la fase de interpolación se arrastran de un bloque al siguiente.
+    """
+
+    def __init__(self, in_rate: int, out_rate: int = SAMPLE_RATE, taps: int = 31):
+        self.step = in_rate / out_rate
+        if in_rate > out_rate:
+            cutoff = 0.45 * out_rate / in_rate
+            n = np.arange(taps) - (taps - 1) / 2
+            kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+            self.kernel = (kernel / kernel.sum()).astype(np.float32)
+        else:
+            self.kernel = np.ones(1, dtype=np.float32)
+        self._history = np.zeros(len(self.kernel) - 1, dtype=np.float32)
+        self._last = 0.0   # última muestra filtrada del bloque anterior (posición -1)
+        self._pos = 0.0    # posición de la próxima muestra de salida en el bloque actual
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        samples = np.concatenate([self._history, block.astype(np.float32, copy=False)])
+        filtered = np.convolve(samples, self.kernel, mode='valid')
+        self._history = samples[len(samples) - len(self._history):]
+
+        length = len(filtered)
+        count = int((length - 1 - self._pos) // self.step) + 1 if self._pos <= length - 1 else 0
+        positions = self._pos + self.step * np.arange(count)
+        out = np.interp(positions, np.arange(-1, length), np.concatenate([[self._last], filtered]))
+
+        self._pos += count * self.step - length
+        if length:
+            self._last = float(filtered[-1])
+        return out.astype(np.float32)
+
+
+class LiveTranscriber:
+    """Lleva los bloques de un AudioRecorder a Whisper mientras se graba.
+
+    El callback de audio solo encola el bloque (mezclado a mono); un hilo lo
+    remuestrea a 16 kHz y lo pasa por el VAD de StreamingTranscription, que
+    envía cada frase al TranscriptionService en memoria en cuanto hay una pausa.
+    on_text(text, latency) se llama con cada frase transcrita.
+    """
+
+    def __init__(self, recorder: AudioRecorder, service: TranscriptionService,
+                 on_text: Optional[Callable[[str, float], None]] = None, **options):
+        self.recorder = recorder
+        self.service = service
+        self.on_text = on_text
+        self.options = options
+
+        self.stream: Optional[StreamingTranscription] = None
+        self._resampler: Optional[Resampler] = None
+        self._blocks: queue.SimpleQueue = queue.SimpleQueue()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self.stream = StreamingTranscription(self.service, **self.options)
+        self._resampler = Resampler(self.recorder.sample_rate)
+        self._blocks = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._loop, name="live-transcription", daemon=True)
+        self._thread.start()
+        self.recorder.add_listener(self._on_block)
+
+    def stop(self, timeout: float = 30.0) -> List[str]:
+        """Deja de escuchar, transcribe la frase abierta y devuelve todas las frases."""
+        if not self._running:
+            return self.texts
+        self.recorder.remove_listener(self._on_block)
+        self._running = False
+        self._blocks.put(None)
+        self._thread.join()
+        self._thread = None
+        self._publish(self.stream.finish(timeout))
+        return self.texts
+
+    def _on_block(self, indata: np.ndarray) -> None:
+        # mean() ya crea un arreglo nuevo: no hace falta copiar indata
+        self._blocks.put(indata.mean(axis=1) if indata.ndim > 1 else indata.copy())
+
+    def _loop(self) -> None:
+        while True:
+            try:
+                block = self._blocks.get(timeout=0.1)
+            except queue.Empty:
+                block = None
+            else:
+                if block is None:
+                    return
+            try:
+                if block is not None:
+                    self.stream.feed(self._resampler.process(block))
+                self._publish(self.stream.poll())
+            except Exception as e:
+                print(f"Error en la transcripción en vivo: {e}")
+
+    def _publish(self, texts: List[str]) -> None:
+        if not texts or not self.on_text:
+            return
+        latencies = list(self.stream.latencies)[-len(texts):]
+        for text, latency in zip(texts, latencies):
+            self.on_text(text, latency)
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    @property
+    def texts(self) -> List[str]:
+        return list(self.stream.texts) if self.stream else []
+
+    def get_stats(self) -> dict:
+        stats = self.stream.get_stats() if self.stream else {}
+        stats['running'] = self._running
+        stats['queued_blocks'] = self._blocks.qsize()
+        return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", default="fast", help="Perfil de transcripción (fast, balanced, accurate)")
+    parser.add_argument("--sample-rate", type=int, default=44100, help="Frecuencia de captura del micrófono")
+    parser.add_argument("--language", default="es", help="Idioma (vacío para detectarlo)")
+    args = parser.parse_args()
+
+    service = TranscriptionService(profile=args.profile, language=args.language or None).warmup()
+    recorder = AudioRecorder(sample_rate=args.sample_rate)
+    live = LiveTranscriber(recorder, service,
+                           on_text=lambda text, latency: print(f"🎙️ {text}  ({latency:.2f}s)"))
+
+    success, message = recorder.start_recording()
+    if not success:
+        print(message)
+        return
+    live.start()
+    print("Escuchando... (Ctrl+C para terminar)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        live.stop()
+        recorder.cleanup()
+        stats = live.get_stats()
+        print(f"\nFrases: {stats['segments']}  latencia media: {stats['mean_latency']:.2f}s  "
+              f"p95: {stats['p95_latency']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
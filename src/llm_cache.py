@@ -0,0 +1,99 @@
+import hashlib
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from time import time
+from typing import Optional
+
+
+class LLMCache:
+    """Caché de respuestas del LLM indexada por el hash del prompt normalizado.
+
+    En memoria es un LRU con TTL; si se indica db_path, las respuestas también
+    se guardan en SQLite y sobreviven a reinicios del servidor.
+    """
+
+    def __init__(self, capacity: int = 256, ttl: float = 3600.0, db_path: Optional[str] = None):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.db_path = db_path
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, response TEXT, created REAL)"
+            )
+            self._db.commit()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(prompt: str) -> str:
+        # Espacios repetidos o en los extremos no cambian la respuesta
+        normalized = re.sub(r"\s+", " ", prompt).strip()
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def get(self, prompt: str) -> Optional[str]:
+        key = self.key(prompt)
+        now = time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT response, created FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row:
+                    entry = (row[0], row[1])
+                    self._store_memory(key, entry)
+
+            if entry is None or now - entry[1] > self.ttl:
+                if entry is not None:
+                    self._delete(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, prompt: str, response: str) -> None:
+        key = self.key(prompt)
+        entry = (response, time())
+        with self._lock:
+            self._store_memory(key, entry)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO llm_cache (key, response, created) VALUES (?, ?, ?)",
+                        (key, response, entry[1])
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"Error al guardar en la caché del LLM: {e}")
+
+    def _store_memory(self, key: str, entry: tuple) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def _delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._db.commit()
+
+    def get_stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'persistent': self._db is not None,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0
+        }
@@ -0,0 +1,148 @@
+import threading
+from time import time
+from typing import Callable, Dict, Optional
+
+
+class Subsystem:
+    """Recurso pesado (modelo, cliente...) que se construye una sola vez, al primer uso
+    o en un hilo de calentamiento, lo que ocurra antes.
+
+    state: pending -> loading -> ready | error. Si la carga falla, el siguiente
+    get() vuelve a intentarlo.
+
+    probe() permite ver cargas hechas por fuera de get() (p. ej. un worker que
+    carga el modelo por su cuenta): devuelve el tiempo de carga si el recurso ya
+    está cargado, o None.
+    """
+
+    def __init__(self, name: str, loader: Callable[[], object], required: bool = True,
+                 probe: Optional[Callable[[], Optional[float]]] = None):
+        self.name = name
+        self.loader = loader
+        self.probe = probe
+        # Los opcionales no bloquean /ready (p. ej. el LLM sin API key)
+        self.required = required
+
+        self._lock = threading.Lock()
+        self.value = None
+        self.state = 'pending'
+        self.error: Optional[str] = None
+        self.load_time = 0.0
+        self.loaded_at: Optional[float] = None
+
+    def get(self):
+        if self.value is not None:
+            return self.value
+        with self._lock:
+            if self.value is None:
+                already_loaded = self.state == 'ready'
+                if not already_loaded:
+                    self.state = 'loading'
+                start = time()
+                try:
+                    value = self.loader()
+                except Exception as e:
+                    self.state = 'error'
+                    self.error = str(e)
+                    self.load_time = time() - start
+                    raise
+                self.value = value
+                # Si el probe ya lo vio cargado, conservar el tiempo de la carga real
+                if not already_loaded:
+                    self._mark_ready(time() - start)
+            return self.value
+
+    def _mark_ready(self, load_time: float) -> None:
+        self.load_time = load_time
+        self.loaded_at = time()
+        self.state = 'ready'
+        self.error = None
+
+    def refresh(self) -> None:
+        """Marca el subsistema como listo si probe() ve que se cargó por otro camino."""
+        if self.state == 'ready' or self.probe is None:
+            return
+        load_time = self.probe()
+        # Sin tomar el lock: no esperar a un get() que todavía está cargando
+        if load_time is not None:
+            self._mark_ready(load_time)
+
+    def get_status(self) -> dict:
+        self.refresh()
+        return {
+            'state': self.state,
+            'required': self.required,
+            'load_time': round(self.load_time, 3),
+            'error': self.error
+        }
+
+
+class Readiness:
+    """Subsistemas pesados del servidor y su calentamiento en segundo plano.
+
+    started_at es el instante en que empezó a importarse la aplicación; con él
+    se informa cuánto tardó el arranque hasta quedar listo para atender.
+    """
+
+    def __init__(self, started_at: Optional[float] = None):
+        self.started_at = started_at or time()
+        self.imported_at = time()
+        self.ready_at: Optional[float] = None
+        self._subsystems: Dict[str, Subsystem] = {}
+        self._warmup_started = False
+
+    def register(self, name: str, loader: Callable[[], object], required: bool = True,
+                 probe: Optional[Callable[[], Optional[float]]] = None) -> Subsystem:
+        subsystem = Subsystem(name, loader, required, probe)
+        self._subsystems[name] = subsystem
+        return subsystem
+
+    def warm_up(self) -> None:
+        """Carga todos los subsistemas en paralelo, cada uno en su hilo, sin bloquear el arranque."""
+        if self._warmup_started:
+            return
+        self._warmup_started = True
+
+        def load(subsystem: Subsystem) -> None:
+            try:
+                subsystem.get()
+            except Exception as e:
+                print(f"⚠️ No se pudo cargar {subsystem.name}: {e}")
+
+        threads = [
+            threading.Thread(target=load, args=(subsystem,), name=f"warmup-{name}", daemon=True)
+            for name, subsystem in self._subsystems.items()
+        ]
+        for thread in threads:
+            thread.start()
+
+        def report() -> None:
+            for thread in threads:
+                thread.join()
+            self.ready_at = time()
+            self.print_report()
+
+        threading.Thread(target=report, name="warmup-report", daemon=True).start()
+
+    @property
+    def ready(self) -> bool:
+        for subsystem in self._subsystems.values():
+            subsystem.refresh()
+        return all(s.state == 'ready' for s in self._subsystems.values() if s.required)
+
+    def print_report(self) -> None:
+        print(f"⏱️ Aplicación importada en {self.imported_at - self.started_at:.2f}s")
+        for subsystem in self._subsystems.values():
+            detail = f"error: {subsystem.error}" if subsystem.state == 'error' else subsystem.state
+            print(f"   {subsystem.name}: {subsystem.load_time:.2f}s ({detail})")
+        if self.ready_at:
+            print(f"⏱️ Calentamiento completo a los {self.ready_at - self.started_at:.2f}s del arranque")
+
+    def get_status(self) -> dict:
+        return {
+            'ready': self.ready,
+            'import_time': round(self.imported_at - self.started_at, 3),
+            'warmup_time': round(self.ready_at - self.started_at, 3) if self.ready_at else None,
+            'uptime': round(time() - self.started_at, 3),
+            'subsystems': {name: s.get_status() for name, s in self._subsystems.items()}
+        }
@@ -0,0 +1,118 @@
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from time import time
+from typing import Optional
+
+
+class SessionStore(ABC):
+    """Estado de cada usuario en el servidor, indexado por el id de sesión de la cookie.
+
+    Guarda dicts serializables a JSON (historial de chat, log de emociones...).
+    """
+
+    @abstractmethod
+    def get(self, sid: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def set(self, sid: str, data: dict) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, sid: str) -> None:
+        ...
+
+    @abstractmethod
+    def get_stats(self) -> dict:
+        ...
+
+
+class MemorySessionStore(SessionStore):
+    """Diccionario en el proceso con expulsión LRU y por inactividad."""
+
+    def __init__(self, max_sessions: int = 1000, ttl: float = 3600.0):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, sid: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._sessions.get(sid)
+            if entry is None:
+                return None
+            if time() - entry[1] > self.ttl:
+                del self._sessions[sid]
+                return None
+            self._sessions.move_to_end(sid)
+            # Copia: los cambios solo cuentan al llamar a set()
+            return json.loads(entry[0])
+
+    def set(self, sid: str, data: dict) -> None:
+        with self._lock:
+            self._sessions[sid] = (json.dumps(data, ensure_ascii=False), time())
+            self._sessions.move_to_end(sid)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def delete(self, sid: str) -> None:
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def get_stats(self) -> dict:
+        return {'backend': 'memory', 'sessions': len(self._sessions), 'max_sessions': self.max_sessions}
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sesiones en SQLite: compartidas entre workers y persistentes entre reinicios."""
+
+    def __init__(self, path: str, ttl: float = 3600.0):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        # WAL permite lecturas concurrentes desde varios procesos mientras otro escribe
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (sid TEXT PRIMARY KEY, data TEXT, updated REAL)"
+        )
+        self._db.commit()
+
+    def get(self, sid: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute("SELECT data, updated FROM sessions WHERE sid = ?", (sid,)).fetchone()
+        if row is None or time() - row[1] > self.ttl:
+            return None
+        return json.loads(row[0])
+
+    def set(self, sid: str, data: dict) -> None:
+        now = time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (sid, data, updated) VALUES (?, ?, ?)",
+                (sid, json.dumps(data, ensure_ascii=False), now)
+            )
+            self._db.execute("DELETE FROM sessions WHERE updated < ?", (now - self.ttl,))
+            self._db.commit()
+
+    def delete(self, sid: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+            self._db.commit()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            count = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        return {'backend': 'sqlite', 'sessions': count, 'path': self.path}
+
+
+def create_session_store() -> SessionStore:
+    """Elige el backend con SESSION_STORE=memory|sqlite (y SESSION_DB para la ruta)."""
+    ttl = float(os.getenv("SESSION_TTL", "3600"))
+    if os.getenv("SESSION_STORE", "memory") == "sqlite":
+        return SQLiteSessionStore(os.getenv("SESSION_DB", "sessions.db"), ttl=ttl)
+    return MemorySessionStore(max_sessions=int(os.getenv("SESSION_MAX", "1000")), ttl=ttl)
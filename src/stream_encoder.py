@@ -0,0 +1,134 @@
+from collections import deque
+from time import time
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+PART_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+PART_FOOTER = b'\r\n'
+
+
+class StreamEncoder:
+    """Codificador MJPEG con límite de FPS y calidad adaptativa.
+
+    Las configuraciones posibles forman una escalera de niveles (calidad JPEG,
+    escala, FPS): primero baja la calidad, luego la resolución y por último los
+    FPS. adapt() sube un nivel cuando los clientes se atrasan o la CPU está
+    saturada, y vuelve a bajar tras recovery_time segundos sin problemas.
+    """
+
+    def __init__(self, max_fps: float = 15.0, quality: int = 80, min_quality: int = 40,
+                 scale: float = 1.0, min_scale: float = 0.5, min_fps: float = 5.0,
+                 adapt_interval: float = 1.0, recovery_time: float = 5.0):
+        self.levels = self._build_levels(max_fps, quality, min_quality, scale, min_scale, min_fps)
+        self.level = 0
+        self.adapt_interval = adapt_interval
+        self.recovery_time = recovery_time
+
+        self._next_frame_at = 0.0
+        self._last_adapt = 0.0
+        self._last_trouble = 0.0
+        # Buffer reutilizado para el frame reescalado (se recrea solo si cambia el tamaño)
+        self._resized: Optional[np.ndarray] = None
+        self._params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+
+        self.frames_encoded = 0
+        self.frames_skipped = 0
+        self.encode_time = 0.0
+        self._sizes = deque(maxlen=100)   # (timestamp, bytes) de los últimos frames
+
+    @staticmethod
+    def _build_levels(max_fps, quality, min_quality, scale, min_scale, min_fps) -> List[Tuple[int, float, float]]:
+        levels = [(quality, scale, max_fps)]
+        while quality > min_quality:
+            quality = max(quality - 10, min_quality)
+            levels.append((quality, scale, max_fps))
+        while scale > min_scale:
+            scale = max(round(scale - 0.125, 3), min_scale)
+            levels.append((quality, scale, max_fps))
+        fps = max_fps
+        while fps > min_fps:
+            fps = max(fps / 2, min_fps)
+            levels.append((quality, scale, fps))
+        return levels
+
+    @property
+    def quality(self) -> int:
+        return self.levels[self.level][0]
+
+    @property
+    def scale(self) -> float:
+        return self.levels[self.level][1]
+
+    @property
+    def fps(self) -> float:
+        return self.levels[self.level][2]
+
+    def due(self, now: float) -> bool:
+        """True si ya toca emitir un frame según el límite de FPS actual."""
+        if now < self._next_frame_at:
+            self.frames_skipped += 1
+            return False
+        # Sin acumular atraso: si se llegó tarde, el próximo frame se cuenta desde ahora
+        self._next_frame_at = max(self._next_frame_at + 1.0 / self.fps, now)
+        return True
+
+    def adapt(self, lagging: bool, busy: bool, now: Optional[float] = None) -> None:
+        now = now or time()
+        if lagging or busy:
+            self._last_trouble = now
+            if now - self._last_adapt >= self.adapt_interval and self.level < len(self.levels) - 1:
+                self._set_level(self.level + 1, now)
+        elif self.level > 0 and now - max(self._last_trouble, self._last_adapt) >= self.recovery_time:
+            self._set_level(self.level - 1, now)
+
+    def _set_level(self, level: int, now: float) -> None:
+        self.level = level
+        self._last_adapt = now
+        self._params[1] = self.quality
+
+    def encode(self, frame: np.ndarray) -> bytes:
+        """Reescala y codifica el frame como una parte multipart MJPEG."""
+        start = time()
+        if self.scale < 1.0:
+            height, width = frame.shape[:2]
+            size = (int(width * self.scale), int(height * self.scale))
+            shape = (size[1], size[0]) + frame.shape[2:]
+            if self._resized is None or self._resized.shape != shape:
+                self._resized = np.empty(shape, dtype=frame.dtype)
+            cv2.resize(frame, size, dst=self._resized, interpolation=cv2.INTER_AREA)
+            frame = self._resized
+
+        ret, buffer = cv2.imencode('.jpg', frame, self._params)
+        if not ret:
+            return b''
+        # join copia el JPEG una sola vez, directo desde el buffer de numpy
+        part = b''.join((PART_HEADER, memoryview(buffer), PART_FOOTER))
+
+        elapsed = time() - start
+        self.encode_time = elapsed if not self.encode_time else 0.9 * self.encode_time + 0.1 * elapsed
+        self.frames_encoded += 1
+        self._sizes.append((start, len(part)))
+        return part
+
+    def bitrate(self) -> float:
+        """kbit/s emitidos en la ventana de los últimos frames."""
+        if len(self._sizes) < 2:
+            return 0.0
+        span = self._sizes[-1][0] - self._sizes[0][0]
+        total = sum(size for _, size in list(self._sizes)[1:])
+        return total * 8 / 1000 / span if span > 0 else 0.0
+
+    def get_stats(self) -> dict:
+        return {
+            'level': self.level,
+            'levels': len(self.levels),
+            'quality': self.quality,
+            'scale': self.scale,
+            'fps': self.fps,
+            'frames_encoded': self.frames_encoded,
+            'frames_skipped': self.frames_skipped,
+            'encode_time': round(self.encode_time, 4),
+            'bitrate_kbps': round(self.bitrate(), 1)
+        }
@@ -0,0 +1,188 @@
+import threading
+import uuid
+from collections import deque
+from time import time, sleep
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.audio_decoding import SAMPLE_RATE
+from src.transcription_service import TranscriptionService, TranscriptionBusyError
+
+
+class StreamingTranscription:
+    """Transcripción incremental de un stream de audio PCM mono a 16 kHz.
+
+    El audio llega en bloques pequeños; un VAD por energía (ventanas de 30 ms)
+    corta una frase cuando hay una pausa de silence_duration segundos (o cuando
+    supera max_segment) y la encola en el TranscriptionService sin esperar.
+    poll() devuelve los textos de los segmentos que ya terminaron de decodificarse.
+
+    Para cada texto se mide la latencia desde el fin de la voz (la última muestra
+    con voz, suponiendo que el último bloque recibido acaba de grabarse) hasta
+    que Whisper terminó el segmento.
+    """
+
+    FRAME = int(SAMPLE_RATE * 0.03)
+
+    def __init__(self, service: TranscriptionService, energy_threshold: float = 0.01,
+                 silence_duration: float = 0.5, max_segment: float = 10.0,
+                 padding: float = 0.2, **options):
+        self.service = service
+        self.energy_threshold = energy_threshold
+        self.silence_frames = int(silence_duration / 0.03)
+        self.max_segment = int(max_segment * SAMPLE_RATE)
+        self.padding = int(padding * SAMPLE_RATE)
+        self.options = options
+
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._scan_pos = 0          # primera muestra aún no evaluada por el VAD
+        self._speech_start: Optional[int] = None
+        self._silent_frames = 0
+
+        self._pending_segments: List[tuple] = []
+        self._jobs = []
+        self.texts: List[str] = []
+        self.latencies = deque(maxlen=50)
+        self.last_activity = time()
+        self._lock = threading.Lock()
+
+    def feed(self, samples: np.ndarray) -> None:
+        with self._lock:
+            self.last_activity = time()
+            self._buffer = np.concatenate([self._buffer, samples.astype(np.float32, copy=False)])
+
+            while self._scan_pos + self.FRAME <= len(self._buffer):
+                frame = self._buffer[self._scan_pos:self._scan_pos + self.FRAME]
+                voiced = float(np.sqrt(np.mean(frame * frame))) >= self.energy_threshold
+                self._scan_pos += self.FRAME
+
+                if voiced:
+                    if self._speech_start is None:
+                        self._speech_start = max(self._scan_pos - self.FRAME - self.padding, 0)
+                    self._silent_frames = 0
+                elif self._speech_start is not None:
+                    self._silent_frames += 1
+
+                if self._speech_start is not None and (
+                        self._silent_frames >= self.silence_frames
+                        or self._scan_pos - self._speech_start >= self.max_segment):
+                    self._cut(self._scan_pos)
+
+            # Sin frase abierta, el audio ya evaluado (salvo el padding) no se necesita
+            if self._speech_start is None and self._scan_pos > self.padding:
+                drop = self._scan_pos - self.padding
+                self._buffer = self._buffer[drop:]
+                self._scan_pos -= drop
+
+    def _cut(self, end: int) -> None:
+        segment = self._buffer[self._speech_start:end]
+        # Muestras grabadas después del fin de la voz: el silencio final y lo aún no evaluado
+        trailing = len(self._buffer) - (end - self._silent_frames * self.FRAME)
+        speech_end_at = time() - trailing / SAMPLE_RATE
+        self._pending_segments.append((segment, speech_end_at))
+        self._buffer = self._buffer[end:]
+        self._scan_pos = max(self._scan_pos - end, 0)
+        self._speech_start = None
+        self._silent_frames = 0
+        self._submit_pending()
+
+    def _submit_pending(self) -> None:
+        while self._pending_segments:
+            segment, speech_end_at = self._pending_segments[0]
+            try:
+                job = self.service.submit(segment, **self.options)
+            except TranscriptionBusyError:
+                # Se reintenta en el próximo bloque
+                return
+            job.speech_end_at = speech_end_at
+            self._jobs.append(job)
+            self._pending_segments.pop(0)
+
+    def poll(self) -> List[str]:
+        """Textos nuevos de los segmentos ya decodificados, en orden."""
+        new_texts = []
+        with self._lock:
+            self._submit_pending()
+            while self._jobs and self._jobs[0].done.is_set():
+                job = self._jobs.pop(0)
+                if job.error:
+                    print(f"Error al transcribir segmento: {job.error}")
+                    continue
+                text = (job.text or "").strip()
+                if text:
+                    self.texts.append(text)
+                    self.latencies.append(job.finished_at - job.speech_end_at)
+                    new_texts.append(text)
+        return new_texts
+
+    def finish(self, timeout: float = 60.0) -> List[str]:
+        """Cierra la frase abierta y espera a que terminen todos los segmentos."""
+        with self._lock:
+            if self._speech_start is not None:
+                self._cut(len(self._buffer))
+        deadline = time() + timeout
+        while time() < deadline:
+            with self._lock:
+                self._submit_pending()
+                pending = self._pending_segments or any(not job.done.is_set() for job in self._jobs)
+                waiting = self._jobs[0] if self._jobs else None
+            if not pending:
+                break
+            if waiting:
+                waiting.done.wait(0.1)
+            else:
+                sleep(0.1)
+        return self.poll()
+
+    @property
+    def text(self) -> str:
+        return " ".join(self.texts)
+
+    def get_stats(self) -> dict:
+        """Latencias fin de voz -> texto (segundos) de los últimos segmentos."""
+        latencies = sorted(self.latencies)
+        p95 = latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)] if latencies else 0.0
+        return {
+            'segments': len(self.texts),
+            'pending': len(self._pending_segments) + len(self._jobs),
+            'last_latency': round(self.latencies[-1], 3) if self.latencies else 0.0,
+            'mean_latency': round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            'p95_latency': round(p95, 3)
+        }
+
+
+class StreamRegistry:
+    """Streams de transcripción activos por id, con expiración por inactividad."""
+
+    def __init__(self, service: TranscriptionService, idle_timeout: float = 60.0, max_streams: int = 32):
+        self.service = service
+        self.idle_timeout = idle_timeout
+        self.max_streams = max_streams
+        self._streams: Dict[str, StreamingTranscription] = {}
+        self._lock = threading.Lock()
+
+    def create(self, **options) -> str:
+        with self._lock:
+            self._evict_idle()
+            if len(self._streams) >= self.max_streams:
+                raise TranscriptionBusyError(self.idle_timeout)
+            stream_id = uuid.uuid4().hex
+            self._streams[stream_id] = StreamingTranscription(self.service, **options)
+            return stream_id
+
+    def get(self, stream_id: str) -> Optional[StreamingTranscription]:
+        with self._lock:
+            return self._streams.get(stream_id)
+
+    def close(self, stream_id: str) -> Optional[StreamingTranscription]:
+        with self._lock:
+            return self._streams.pop(stream_id, None)
+
+    def _evict_idle(self) -> None:
+        now = time()
+        for stream_id in [s for s, st in self._streams.items() if now - st.last_activity > self.idle_timeout]:
+            del self._streams[stream_id]
+
+    def __len__(self) -> int:
+        return len(self._streams)
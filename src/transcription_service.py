@@ -0,0 +1,210 @@
+import os
+import threading
+from collections import deque
+from queue import Queue, Full
+from time import time
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from faster_whisper import WhisperModel
+
+# Perfiles calidad/latencia: modelo + opciones de decodificación
+PROFILES = {
+    'fast': {'model': 'tiny', 'beam_size': 1, 'vad_filter': True},
+    'balanced': {'model': 'base', 'beam_size': 5, 'vad_filter': True},
+    'accurate': {'model': 'small', 'beam_size': 5, 'vad_filter': False},
+}
+
+
+class TranscriptionBusyError(Exception):
+    """La cola de transcripción está llena; el cliente debe reintentar más tarde."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Servicio de transcripción saturado, reintentar en {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class TranscriptionJob:
+    def __init__(self, audio, model_size: str, options: dict):
+        self.audio = audio
+        self.model_size = model_size
+        self.options = options
+        self.done = threading.Event()
+        self.text: Optional[str] = None
+        self.info = None
+        self.error: Optional[Exception] = None
+        self.submitted_at = time()
+        self.started_at = 0.0
+        self.finished_at = 0.0
+        self.real_time_factor = 0.0
+
+
+class TranscriptionService:
+    """Dueño del modelo Whisper: recibe trabajos por una cola acotada y los procesa
+    con un número fijo de hilos, dimensionados según los núcleos de la máquina.
+
+    Con la cola llena submit() lanza TranscriptionBusyError en lugar de aceptar
+    más trabajo, para que los usuarios concurrentes no sobresuscriban la CPU.
+
+    Cada trabajo usa un perfil de PROFILES (el del servidor por defecto); los
+    modelos de otros perfiles se cargan la primera vez que se piden. Si se conoce
+    el idioma se fija para saltar la detección de idioma.
+    """
+
+    def __init__(self, profile: str = "balanced", compute_type: str = "int8",
+                 num_workers: Optional[int] = None, cpu_threads: Optional[int] = None,
+                 max_queue: int = 8, language: Optional[str] = "es"):
+        if profile not in PROFILES:
+            raise ValueError(f"Perfil de transcripción desconocido: {profile}")
+        cores = os.cpu_count() or 1
+        # Pocos trabajos en paralelo con varios hilos cada uno rinde mejor que muchos de un hilo
+        self.num_workers = num_workers or max(1, cores // 4)
+        self.cpu_threads = cpu_threads or max(1, cores // self.num_workers)
+        self.profile = profile
+        self.compute_type = compute_type
+        self.language = language
+
+        self._lock = threading.Lock()
+        # Protege solo el diccionario de locks; cada modelo se carga bajo su propio lock
+        self._model_lock = threading.Lock()
+        self._model_locks = {}
+        # Los modelos se cargan al primer uso o con warmup()
+        self._models = {}
+        self.load_times = {}
+
+        self._queue: Queue = Queue(maxsize=max_queue)
+        self._latencies = deque(maxlen=50)
+        self._rtfs = {}
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+
+        self._threads = []
+        for i in range(self.num_workers):
+            thread = threading.Thread(target=self._worker, name=f"transcription-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def get_model(self, model_size: str) -> "WhisperModel":
+        # Camino rápido sin lock: los workers del modelo ya cargado nunca esperan
+        model = self._models.get(model_size)
+        if model is not None:
+            return model
+        with self._model_lock:
+            lock = self._model_locks.setdefault(model_size, threading.Lock())
+        # Cargar (o descargar) un modelo nuevo solo bloquea a quien pidió ese mismo modelo
+        with lock:
+            model = self._models.get(model_size)
+            if model is None:
+                # faster_whisper (y ctranslate2) solo se importan al cargar el primer modelo
+                from faster_whisper import WhisperModel
+                start = time()
+                model = WhisperModel(
+                    model_size,
+                    device="cpu",
+                    compute_type=self.compute_type,
+                    cpu_threads=self.cpu_threads,
+                    num_workers=self.num_workers
+                )
+                self.load_times[model_size] = time() - start
+                self._models[model_size] = model
+                print(f"Modelo Whisper '{model_size}' cargado en {self.load_times[model_size]:.2f}s")
+            return model
+
+    def warmup(self) -> "TranscriptionService":
+        """Carga el modelo del perfil por defecto antes de la primera transcripción."""
+        self.get_model(PROFILES[self.profile]['model'])
+        return self
+
+    def resolve(self, profile: Optional[str] = None, **options):
+        """Devuelve (model_size, opciones) del perfil, con overrides explícitos."""
+        profile = profile or self.profile
+        if profile not in PROFILES:
+            raise ValueError(f"Perfil de transcripción desconocido: {profile}")
+        settings = dict(PROFILES[profile])
+        model_size = settings.pop('model')
+        if self.language:
+            settings['language'] = self.language
+        settings.update(options)
+        return model_size, settings
+
+    def submit(self, audio, profile: Optional[str] = None, **options) -> TranscriptionJob:
+        model_size, options = self.resolve(profile, **options)
+        job = TranscriptionJob(audio, model_size, options)
+        try:
+            self._queue.put_nowait(job)
+        except Full:
+            with self._lock:
+                self.rejected += 1
+            raise TranscriptionBusyError(self.estimated_wait())
+        return job
+
+    def transcribe(self, audio, profile: Optional[str] = None, timeout: Optional[float] = None, **options):
+        """Encola el audio y espera el resultado. Devuelve (text, info)."""
+        job = self.submit(audio, profile, **options)
+        if not job.done.wait(timeout):
+            raise TimeoutError("La transcripción tardó demasiado")
+        if job.error:
+            raise job.error
+        return job.text, job.info
+
+    def _worker(self) -> None:
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                self.active += 1
+            job.started_at = time()
+            try:
+                model = self.get_model(job.model_size)
+                segments, info = model.transcribe(job.audio, **job.options)
+                # segments es un generador: la decodificación ocurre al recorrerlo
+                job.text = " ".join([seg.text for seg in segments])
+                job.info = info
+                if info.duration:
+                    job.real_time_factor = (time() - job.started_at) / info.duration
+            except Exception as e:
+                job.error = e
+            finally:
+                job.finished_at = time()
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+                    self._latencies.append(job.finished_at - job.submitted_at)
+                    if job.real_time_factor:
+                        self._rtfs.setdefault(job.model_size, deque(maxlen=50)).append(job.real_time_factor)
+                job.done.set()
+                self._queue.task_done()
+
+    def _mean_latency(self) -> float:
+        with self._lock:
+            latencies = list(self._latencies)
+        return sum(latencies) / len(latencies) if latencies else 5.0
+
+    def estimated_wait(self) -> float:
+        """Segundos estimados hasta que se libere un lugar en la cola."""
+        pending = self._queue.qsize() + self.active
+        return max(1.0, self._mean_latency() * pending / self.num_workers)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            rtfs = {size: round(sum(v) / len(v), 3) for size, v in self._rtfs.items() if v}
+        loaded = list(self._models)
+        p95 = latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)] if latencies else 0.0
+        return {
+            'profile': self.profile,
+            'language': self.language,
+            'loaded_models': loaded,
+            'load_times': {size: round(t, 3) for size, t in self.load_times.items()},
+            'compute_type': self.compute_type,
+            'workers': self.num_workers,
+            'cpu_threads': self.cpu_threads,
+            'queue_depth': self._queue.qsize(),
+            'queue_capacity': self._queue.maxsize,
+            'active': self.active,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'mean_latency': round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            'p95_latency': round(p95, 3),
+            'real_time_factor': rtfs
+        }
@@ -0,0 +1,217 @@
+import os
+import tempfile
+import threading
+from time import time
+from typing import Dict, List, Optional
+
+from src.audio_recorder import AudioRecorder
+from src.emotion_log import EmotionLog
+from src.event_broadcast import EventBroadcaster, sse_event
+
+
+class SessionLimitError(Exception):
+    """Se alcanzó el máximo de sesiones simultáneas."""
+
+
+def create_journal_file() -> str:
+    temp_file = tempfile.NamedTemporaryFile(
+        mode='w',
+        suffix='.jsonl',
+        prefix='emotions_session_',
+        delete=False,
+        encoding='utf-8'
+    )
+    temp_file.close()
+    return temp_file.name
+
+
+class UserSession:
+    """Estado de análisis de un usuario: su log de emociones, su última detección,
+    si está capturando y su grabadora de audio."""
+
+    def __init__(self, sid: str, store=None, sync_interval: float = 5.0):
+        self.sid = sid
+        # SessionStore compartido entre workers donde se publican los agregados de emociones
+        self.store = store
+        self.sync_interval = sync_interval
+        self._last_sync = 0.0
+        self.current_emotion_data = {
+            'emotion': 'neutral',
+            'confidence': 0.0,
+            'all_emotions': {},
+            'timestamp': time()
+        }
+        self.is_capturing = True  # Estado de captura
+        # Clientes de /video_feed abiertos por este usuario
+        self.camera_viewers = 0
+        self._viewers_lock = threading.Lock()
+        # Historial en memoria + journal JSON-lines en disco
+        self.emotion_log = EmotionLog(create_journal_file())
+        self._recorder: Optional[AudioRecorder] = None
+        # Clientes de /emotion_stream de este usuario (puede tener varias pestañas)
+        self.events = EventBroadcaster()
+        self.last_seen = time()
+
+    @property
+    def recorder(self) -> AudioRecorder:
+        if self._recorder is None:
+            self._recorder = AudioRecorder()
+        return self._recorder
+
+    @property
+    def active(self) -> bool:
+        """Tiene streams abiertos o una grabación en curso: no se puede expulsar."""
+        return bool(
+            self.camera_viewers
+            or len(self.events)
+            or (self._recorder and self._recorder.is_recording)
+        )
+
+    def attach_viewer(self) -> None:
+        with self._viewers_lock:
+            self.camera_viewers += 1
+
+    def detach_viewer(self) -> None:
+        with self._viewers_lock:
+            self.camera_viewers -= 1
+
+    def publish_emotion(self, emotion, confidence, all_emotions, timestamp,
+                        message: Optional[bytes] = None) -> None:
+        """message: el evento SSE ya serializado, si el mismo resultado va a varias sesiones."""
+        # Si la captura se pausó mientras se analizaba, descartar el resultado
+        if not self.is_capturing:
+            return
+
+        self.current_emotion_data = {
+            'emotion': emotion,
+            'confidence': confidence,
+            'all_emotions': all_emotions,
+            'timestamp': timestamp
+        }
+        self.emotion_log.append(emotion, timestamp, all_emotions)
+        if self.store is not None and time() - self._last_sync >= self.sync_interval:
+            self.sync_emotions()
+        if len(self.events):
+            if message is None:
+                message = sse_event(self.current_emotion_data, 'emotion').encode('utf-8')
+            self.events.publish_message(message)
+
+    @property
+    def emotions_key(self) -> str:
+        # Clave propia: no compite con el read-modify-write de la conversación
+        return f"{self.sid}:emotions"
+
+    def sync_emotions(self) -> None:
+        """Publica summary() del log en el store para que otros workers lo vean."""
+        self._last_sync = time()
+        try:
+            self.store.set(self.emotions_key, self.emotion_log.summary())
+        except Exception as e:
+            print(f"Error al guardar las emociones de la sesión: {e}")
+
+    def emotion_summary(self) -> dict:
+        """summary() del log local o, si este worker no recibió detecciones, el del store."""
+        if len(self.emotion_log) or self.store is None:
+            return self.emotion_log.summary()
+        return self.store.get(self.emotions_key) or self.emotion_log.summary()
+
+    def restart(self) -> None:
+        old_path = self.emotion_log.journal_path
+        try:
+            # Empezar un historial nuevo con su propio journal
+            self.emotion_log.reset(create_journal_file())
+            if self.store is not None:
+                self.sync_emotions()
+
+            # Eliminar archivo anterior
+            if old_path and os.path.exists(old_path):
+                os.unlink(old_path)
+                print(f"Sesión anterior eliminada: {old_path}")
+            print(f"Nueva sesión iniciada: {self.emotion_log.journal_path}")
+
+        except Exception as e:
+            print(f"Error al reiniciar sesión: {e}")
+
+    def cleanup(self) -> None:
+        self.events.close()
+        if self._recorder:
+            self._recorder.cleanup()
+        journal_path = self.emotion_log.journal_path
+        try:
+            if journal_path and os.path.exists(journal_path):
+                os.unlink(journal_path)
+                print(f"Archivo de sesión eliminado: {journal_path}")
+        except Exception as e:
+            print(f"Error al eliminar archivo de sesión: {e}")
+
+
+class UserSessionRegistry:
+    """Mapea cada sesión de cliente a su UserSession.
+
+    Las sesiones inactivas por más de idle_timeout se expulsan (borrando su
+    journal y su grabación) y nunca hay más de max_sessions a la vez: si se
+    llena, una sesión nueva desplaza a la vista hace más tiempo que no tenga
+    streams ni grabaciones en curso. El lock
+    del registro solo protege el diccionario; cada sesión tiene su propio estado.
+    """
+
+    def __init__(self, max_sessions: int = 50, idle_timeout: float = 1800.0, store=None):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.store = store
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, UserSession] = {}
+
+    def get(self, sid: str) -> UserSession:
+        evicted = []
+        with self._lock:
+            user_session = self._sessions.get(sid)
+            if user_session is None:
+                evicted = self._evict_idle()
+                if len(self._sessions) >= self.max_sessions:
+                    # Lleno: se expulsa la sesión sin actividad en curso vista hace más tiempo
+                    candidates = [s for s in self._sessions.values() if not s.active]
+                    if not candidates:
+                        raise SessionLimitError(
+                            f"Se alcanzó el máximo de {self.max_sessions} sesiones simultáneas"
+                        )
+                    oldest = min(candidates, key=lambda s: s.last_seen)
+                    evicted.append(self._sessions.pop(oldest.sid))
+                user_session = UserSession(sid, store=self.store)
+                self._sessions[sid] = user_session
+            user_session.last_seen = time()
+        # La limpieza toca disco: fuera del lock
+        for old in evicted:
+            old.cleanup()
+        return user_session
+
+    def peek(self, sid: Optional[str]) -> Optional[UserSession]:
+        """La sesión si ya existe, sin crearla ni contarla como actividad."""
+        with self._lock:
+            return self._sessions.get(sid) if sid else None
+
+    def _evict_idle(self) -> List[UserSession]:
+        now = time()
+        idle = [sid for sid, s in self._sessions.items()
+                if now - s.last_seen > self.idle_timeout and not s.active]
+        return [self._sessions.pop(sid) for sid in idle]
+
+    def camera_sessions(self) -> List[UserSession]:
+        """Sesiones que están viendo la cámara del servidor y capturando."""
+        with self._lock:
+            return [s for s in self._sessions.values() if s.camera_viewers and s.is_capturing]
+
+    def close_all(self) -> None:
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for user_session in sessions:
+            user_session.cleanup()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                'active': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'camera_viewers': sum(1 for s in self._sessions.values() if s.camera_viewers)
+            }
@@ -46,18 +46,24 @@ function showMessage(text, type) {
     setTimeout(() => msg.remove(), 3000);
 }
 
-// Simulate emotion detection
-setInterval(() => {
-    if (!isPaused) {
-        const emotions = ['Feliz', 'Triste', 'Neutral', 'Sorprendido', 'Enojado'];
-        const emotion = emotions[Math.floor(Math.random() * emotions.length)];
-        const confidence = Math.floor(Math.random() * 30) + 70;
-
-        document.getElementById('detectedEmotion').textContent = emotion;
-        document.getElementById('emotionConfidence').textContent = confidence + '% confianza';
-        document.getElementById('videoEmotion').textContent = emotion;
-    }
-}, 3000);
+function showEmotion(data) {
+    document.getElementById('emotionOverlay').style.display = 'block';
+    document.getElementById('detectedEmotion').textContent = data.emotion;
+    document.getElementById('emotionConfidence').textContent = Math.round(data.confidence) + '% confianza';
+}
+
+// Detecciones de la cámara del servidor empujadas por SSE, sin polling
+function startEmotionStream() {
+    const source = new EventSource('/emotion_stream');
+    source.addEventListener('emotion', e => {
+        if (!isPaused) showEmotion(JSON.parse(e.data));
+    });
+    // Pausas/reanudaciones hechas desde otra pestaña de la misma sesión
+    source.addEventListener('capture', e => {
+        const data = JSON.parse(e.data);
+        if (data.capturing === isPaused) togglePause();
+    });
+}
 
 // Animate visualizer
 setInterval(() => {
@@ -68,4 +74,67 @@ setInterval(() => {
             bar.classList.remove('inactive');
         });
     }
-}, 100);
\ No newline at end of file
+}, 100);
+
+// Modo cámara del navegador (?camera=browser): en lugar de la cámara del servidor,
+// se envían frames reducidos y comprimidos a /analyze_frame
+const FRAME_WIDTH = 320;
+const FRAME_INTERVAL_MS = 500;
+let frameInFlight = false;
+
+async function startBrowserCamera() {
+    const img = document.getElementById('videoStream');
+    const video = document.createElement('video');
+    video.className = img.className;
+    video.id = img.id;
+    video.autoplay = true;
+    video.muted = true;
+    video.playsInline = true;
+    img.replaceWith(video);
+
+    try {
+        video.srcObject = await navigator.mediaDevices.getUserMedia({ video: true });
+    } catch (err) {
+        showMessage('No se pudo acceder a la cámara: ' + err.message, 'error');
+        return;
+    }
+
+    const canvas = document.createElement('canvas');
+    const ctx = canvas.getContext('2d');
+    // WebP si el navegador lo codifica; si no, JPEG
+    const webp = canvas.toDataURL('image/webp').startsWith('data:image/webp');
+
+    setInterval(() => {
+        // Como mucho un frame en vuelo: si el servidor va lento, se saltan frames
+        if (isPaused || frameInFlight || !video.videoWidth) return;
+
+        canvas.width = FRAME_WIDTH;
+        canvas.height = Math.round(video.videoHeight * FRAME_WIDTH / video.videoWidth);
+        ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
+        frameInFlight = true;
+        canvas.toBlob(blob => sendFrame(blob), webp ? 'image/webp' : 'image/jpeg', 0.7);
+    }, FRAME_INTERVAL_MS);
+}
+
+async function sendFrame(blob) {
+    try {
+        const res = await fetch('/analyze_frame', {
+            method: 'POST',
+            headers: { 'Content-Type': blob.type },
+            body: blob
+        });
+        const data = await res.json();
+        if (res.ok && data.emotion) showEmotion(data);
+    } catch (err) {
+        console.error('Error al analizar frame:', err);
+    } finally {
+        frameInFlight = false;
+    }
+}
+
+const browserCamera = new URLSearchParams(window.location.search).get('camera') === 'browser';
+if (browserCamera) {
+    startBrowserCamera();
+} else {
+    startEmotionStream();
+}
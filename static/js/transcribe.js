@@ -6,6 +6,7 @@ const statusText = document.getElementById("status");
 let audioContext = null;
 let analyzer = null;
 let isAudioAnimating = false;
+let liveTranscription = null;
 
 // --- Mostrar mensajes en pantalla ---
 function addMessage(role, text) {
@@ -206,10 +207,175 @@ function stopAudioAnalysis() {
     });
 }
 
+// --- Transcripción en vivo: PCM 16 kHz por bloques con resultados parciales ---
+// Solo se usa si el navegador no acepta un AudioContext a 16 kHz: mismo
+// esquema que Resampler en src/live_transcription.py (FIR pasa-bajos para
+// evitar aliasing e interpolación con la fase arrastrada entre bloques)
+function createResampler(inputRate, outputRate = 16000, taps = 31) {
+    const step = inputRate / outputRate;
+    let kernel = [1];
+    if (inputRate > outputRate) {
+        const cutoff = 0.45 * outputRate / inputRate;
+        kernel = [];
+        for (let n = 0; n < taps; n++) {
+            const t = n - (taps - 1) / 2;
+            const sinc = t === 0 ? 1 : Math.sin(2 * Math.PI * cutoff * t) / (2 * Math.PI * cutoff * t);
+            const hamming = 0.54 - 0.46 * Math.cos(2 * Math.PI * n / (taps - 1));
+            kernel.push(2 * cutoff * sinc * hamming);
+        }
+        const sum = kernel.reduce((a, b) => a + b, 0);
+        kernel = kernel.map(k => k / sum);
+    }
+    let history = new Float32Array(kernel.length - 1);
+    let last = 0;   // última muestra filtrada del bloque anterior (posición -1)
+    let pos = 0;    // posición de la próxima muestra de salida en el bloque actual
+
+    return function (input) {
+        const samples = new Float32Array(history.length + input.length);
+        samples.set(history);
+        samples.set(input, history.length);
+        const length = samples.length - kernel.length + 1;
+        const filtered = new Float32Array(Math.max(length, 0));
+        for (let i = 0; i < length; i++) {
+            let acc = 0;
+            for (let k = 0; k < kernel.length; k++) {
+                acc += samples[i + k] * kernel[kernel.length - 1 - k];
+            }
+            filtered[i] = acc;
+        }
+        history = samples.slice(samples.length - history.length);
+
+        const output = [];
+        for (; pos <= length - 1; pos += step) {
+            const i = Math.floor(pos);
+            const frac = pos - i;
+            const a = i < 0 ? last : filtered[i];
+            const b = filtered[i + 1] ?? a;
+            output.push(a + (b - a) * frac);
+        }
+        pos -= length;
+        if (length > 0) last = filtered[length - 1];
+        return Float32Array.from(output);
+    };
+}
+
+function toInt16(input) {
+    const output = new Int16Array(input.length);
+    for (let i = 0; i < input.length; i++) {
+        const sample = Math.max(-1, Math.min(1, input[i]));
+        output[i] = sample < 0 ? sample * 0x8000 : sample * 0x7FFF;
+    }
+    return output;
+}
+
+function createCaptureContext(stream, sampleRate) {
+    const AudioContextClass = window.AudioContext || window.webkitAudioContext;
+    // El navegador remuestrea el micrófono a 16 kHz con su propio filtro
+    try {
+        const context = new AudioContextClass({ sampleRate });
+        return { context, source: context.createMediaStreamSource(stream) };
+    } catch (err) {
+        console.warn("AudioContext a 16 kHz no disponible, se remuestrea en JS:", err);
+    }
+    const context = new AudioContextClass();
+    return { context, source: context.createMediaStreamSource(stream) };
+}
+
+function showLiveText(text) {
+    if (!liveTranscription.element) {
+        liveTranscription.element = document.createElement("div");
+        liveTranscription.element.className = "msg user live";
+        chatBox.appendChild(liveTranscription.element);
+        if (chatBox.classList.contains('empty')) {
+            chatBox.classList.remove('empty');
+        }
+    }
+    liveTranscription.element.textContent = text;
+    chatBox.scrollTop = chatBox.scrollHeight;
+}
+
+async function sendLiveChunk() {
+    const live = liveTranscription;
+    if (!live || live.buffers.length === 0) return;
+
+    const total = live.buffers.reduce((n, b) => n + b.length, 0);
+    const pcm = new Int16Array(total);
+    let offset = 0;
+    live.buffers.forEach(b => { pcm.set(b, offset); offset += b.length; });
+    live.buffers = [];
+
+    // Los bloques se envían en orden para que el VAD del servidor vea audio continuo
+    live.sending = live.sending.then(async () => {
+        const res = await fetch(`/transcribe_stream/${live.streamId}/chunk`, {
+            method: "POST",
+            headers: { "Content-Type": "application/octet-stream" },
+            body: pcm.buffer
+        });
+        const data = await res.json();
+        if (data.text && liveTranscription === live) {
+            showLiveText(data.text);
+        }
+    }).catch(err => console.error("Error enviando audio:", err));
+}
+
+async function startLiveTranscription(stream) {
+    const res = await fetch("/transcribe_stream/start", { method: "POST" });
+    if (!res.ok) throw new Error("No se pudo iniciar la transcripción en vivo");
+    const data = await res.json();
+
+    const sampleRate = data.sample_rate || 16000;
+    const { context, source } = createCaptureContext(stream, sampleRate);
+    const processor = context.createScriptProcessor(4096, 1, 1);
+    const resample = context.sampleRate === sampleRate ? null : createResampler(context.sampleRate, sampleRate);
+
+    liveTranscription = {
+        streamId: data.stream_id,
+        context, source, processor, stream,
+        buffers: [],
+        sending: Promise.resolve(),
+        element: null,
+        timer: setInterval(sendLiveChunk, 500)
+    };
+
+    processor.onaudioprocess = (event) => {
+        if (liveTranscription) {
+            const input = event.inputBuffer.getChannelData(0);
+            liveTranscription.buffers.push(toInt16(resample ? resample(input) : input));
+        }
+    };
+    source.connect(processor);
+    processor.connect(context.destination);
+}
+
+async function stopLiveTranscription() {
+    const live = liveTranscription;
+    clearInterval(live.timer);
+    live.processor.disconnect();
+    live.source.disconnect();
+    live.stream.getTracks().forEach(track => track.stop());
+    await sendLiveChunk();
+    liveTranscription = null;
+    await live.context.close();
+    await live.sending;
+
+    showTypingIndicator();
+    const res = await fetch(`/transcribe_stream/${live.streamId}/finish`, { method: "POST" });
+    const data = await res.json();
+    if (live.element) {
+        live.element.remove();
+    }
+    await handleTranscription(data);
+}
+
 // --- Grabación de audio ---
 recordBtn.addEventListener("click", async () => {
-    if (mediaRecorder && mediaRecorder.state === "recording") {
-        mediaRecorder.stop();
+    const recording = liveTranscription || (mediaRecorder && mediaRecorder.state === "recording");
+    if (recording) {
+        if (liveTranscription) {
+            stopLiveTranscription();
+        } else {
+            mediaRecorder.stop();
+        }
         
         // Actualizar botón a estado normal
         recordBtn.innerHTML = `
@@ -239,19 +405,27 @@ recordBtn.addEventListener("click", async () => {
         }
     } else {
         const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
-        mediaRecorder = new MediaRecorder(stream);
-        audioChunks = [];
-
-        mediaRecorder.ondataavailable = (event) => {
-            audioChunks.push(event.data);
-        };
 
-        mediaRecorder.onstop = async () => {
-            const audioBlob = new Blob(audioChunks, { type: "audio/wav" });
-            await sendAudio(audioBlob);
-        };
-
-        mediaRecorder.start();
+        try {
+            await startLiveTranscription(stream);
+        } catch (err) {
+            // Sin transcripción en vivo: grabar el clip completo y enviarlo al terminar
+            console.warn("Transcripción en vivo no disponible:", err);
+            liveTranscription = null;
+            mediaRecorder = new MediaRecorder(stream);
+            audioChunks = [];
+
+            mediaRecorder.ondataavailable = (event) => {
+                audioChunks.push(event.data);
+            };
+
+            mediaRecorder.onstop = async () => {
+                const audioBlob = new Blob(audioChunks, { type: "audio/wav" });
+                await sendAudio(audioBlob);
+            };
+
+            mediaRecorder.start();
+        }
         
         // Actualizar botón a estado grabando
         recordBtn.innerHTML = `
@@ -290,7 +464,11 @@ async function sendAudio(blob) {
     showTypingIndicator();
     const res = await fetch("/transcribe_audio", { method: "POST", body: formData });
     const data = await res.json();
+    await handleTranscription(data);
+}
 
+// --- Mostrar la transcripción final y enviarla al modelo ---
+async function handleTranscription(data) {
     if (data.text) {
         const userText = data.text.trim();
         hideTypingIndicator();
@@ -321,13 +499,78 @@ async function sendToLLM(userText) {
     
     const res = await fetch("/llm", {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        headers: {
+            "Content-Type": "application/json",
+            "Accept": "text/event-stream, application/json"
+        },
         body: JSON.stringify({ text: userText })
     });
 
+    // Las preguntas llegan en streaming (SSE); las recomendaciones finales como JSON
+    const contentType = res.headers.get("Content-Type") || "";
+    if (contentType.includes("text/event-stream")) {
+        await readLLMStream(res);
+        return;
+    }
+
     const data = await res.json();
     hideTypingIndicator();
+    handleLLMResponse(data);
+}
+
+// --- Leer la respuesta del modelo token a token ---
+async function readLLMStream(res) {
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let element = null;
+    let text = "";
+    let result = null;
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Cada evento SSE termina con una línea en blanco
+        let boundary;
+        while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            const dataLines = rawEvent.split("\n")
+                .filter(line => line.startsWith("data:"))
+                .map(line => line.slice(5).trim());
+            if (dataLines.length === 0) continue;
+            const payload = JSON.parse(dataLines.join("\n"));
+
+            if (payload.delta) {
+                if (!element) {
+                    hideTypingIndicator();
+                    addMessage("assistant", "");
+                    element = chatBox.lastElementChild;
+                }
+                text += payload.delta;
+                element.textContent = text;
+                chatBox.scrollTop = chatBox.scrollHeight;
+            } else {
+                result = payload;
+            }
+        }
+    }
 
+    hideTypingIndicator();
+    if (result && result.response && element) {
+        // El texto ya se mostró mientras llegaba; solo falta leerlo en voz alta
+        element.textContent = result.response;
+        handleLLMResponse(result, true);
+    } else {
+        handleLLMResponse(result || {});
+    }
+}
+
+// --- Mostrar la respuesta del modelo y actualizar el estado ---
+function handleLLMResponse(data, alreadyShown = false) {
     if (data.done && data.parsed) {
         // ✅ Mostrar recomendaciones con logo de Spotify y links clickeables
         mostrarRecomendaciones(data.response);
@@ -339,7 +582,9 @@ async function sendToLLM(userText) {
             recordingStatus.textContent = "Conversación completada";
         }
     } else if (data.response) {
-        addMessage("assistant", data.response);
+        if (!alreadyShown) {
+            addMessage("assistant", data.response);
+        }
         speak(data.response);
 
         if (data.done) {